@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+"""Benchmark measuring the memory kept by macro libraries and warnings
+
+The memory retained by the objects a run leaves behind is measured with tracemalloc:
+a library of many macros, the warnings of a noisy input, and the same warnings kept as raised
+Log exceptions next to the LogRecords the generator keeps, which shows what the lighter records save.
+Results can be written as JSON and compared with an earlier run, like the timing suite.
+
+Run from the src directory:
+    python3 -m benchmark.memory [--count N] [--output results.json] [--baseline old.json]
+"""
+
+import gc
+import json
+from optparse import OptionParser
+import sys
+import tracemalloc
+
+from error.log import Log
+from error.logrecord import LogRecord
+from macrogenerator.macrogenerator import MacroGenerator, load_prelude
+
+RESULTS_VERSION = 1
+DEFAULT_COUNT = 100 * 1000
+DEFAULT_THRESHOLD = 0.1
+
+def retained(function) -> int:
+    """Measures the memory in bytes retained by the result of a function
+
+    Args:
+        function:       the function, called without arguments
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = function()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return after - before
+
+def result(name: str, count: int, size: int) -> dict:
+    """Summarizes the memory of a benchmark
+
+    Args:
+        name (str):     name of the benchmark
+        count (int):    amount of objects kept
+        size (int):     the retained memory in bytes
+    """
+    return {
+        "name": name,
+        "count": count,
+        "bytes": size,
+        "bytes_per_unit": size / max(count, 1),
+    }
+
+def bench_macros(count: int) -> [dict]:
+    """Measures a frozen library of macros loaded from a prelude
+    """
+    source_text = "".join("#MACRO%d(A,B){&A& and &B&}\n" % i for i in range(count))
+    return [result("macros/library", count, retained(lambda: load_prelude(source_text)[0]))]
+
+def bench_warnings(count: int) -> [dict]:
+    """Measures the warnings of an input with an empty and a whitespace argument in every call
+    """
+    source_text = "#WARNING(A,B){&A&&B&}\n" + "$WARNING(, x)\n" * (count // 2)
+    return [result("warnings/transform", count, retained(lambda: MacroGenerator().transform(source_text)[1]))]
+
+def bench_records(count: int) -> [dict]:
+    """Measures the same warnings kept as Log exceptions and as LogRecords
+    """
+    args = ("MACRO", "")
+    return [result("records/log", count, retained(lambda: [Log("w21", line, args) for line in range(count)])),
+            result("records/logrecord", count, retained(lambda: [LogRecord("w21", line, args) for line in range(count)]))]
+
+def run_memory(count: int = DEFAULT_COUNT) -> dict:
+    """Runs the benchmarks
+
+    Args:
+        count (int):    amount of macros and warnings kept
+
+    Returns:
+        dict:           the results, as written to JSON
+    """
+    results = bench_macros(count) + bench_warnings(count) + bench_records(count)
+    return {
+        "version": RESULTS_VERSION,
+        "count": count,
+        "results": results,
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> [(str, float)]:
+    """Finds the benchmarks which retain more memory per object than in the baseline by more than the threshold
+
+    Args:
+        results (dict):     the current results
+        baseline (dict):    the results of an earlier run
+        threshold (float):  allowed growth, e.g. 0.1 for 10%
+
+    Returns:
+        list of pairs (str, float) of the names of regressed benchmarks and their growth ratios.
+    """
+    old = {entry["name"]: entry for entry in baseline["results"]}
+    regressions = []
+    for entry in results["results"]:
+        if entry["name"] not in old or old[entry["name"]]["bytes_per_unit"] <= 0:
+            continue
+        ratio = entry["bytes_per_unit"] / old[entry["name"]]["bytes_per_unit"]
+        if ratio > 1 + threshold:
+            regressions.append((entry["name"], ratio))
+    return regressions
+
+if __name__ == "__main__":
+    opt_parser = OptionParser(usage="usage: %prog [options]")
+    opt_parser.add_option("-c", "--count", action="store", type="int", dest="count",
+                            default=DEFAULT_COUNT, help="amount of macros and warnings kept")
+    opt_parser.add_option("-o", "--output", action="store", type="string", dest="output",
+                            help="writes the results as JSON to a file")
+    opt_parser.add_option("-b", "--baseline", action="store", type="string", dest="baseline",
+                            help="JSON results of an earlier run to compare with")
+    opt_parser.add_option("-t", "--threshold", action="store", type="float", dest="threshold",
+                            default=DEFAULT_THRESHOLD, help="allowed growth against the baseline, 0.1 by default")
+    (options, args) = opt_parser.parse_args()
+    if options.count < 1:
+        opt_parser.error("The amount of objects has to be positive.")
+
+    results = run_memory(options.count)
+
+    print("%-28s %10s %14s %12s" % ("benchmark", "count", "bytes", "bytes/unit"))
+    for entry in results["results"]:
+        print("%-28s %10d %14d %12.1f" % (entry["name"], entry["count"], entry["bytes"], entry["bytes_per_unit"]))
+
+    if options.output != None:
+        with open(options.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if options.baseline != None:
+        with open(options.baseline, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, options.threshold)
+        for (name, ratio) in regressions:
+            print("Regression: %s retains %.2fx more memory than the baseline." % (name, ratio))
+        if len(regressions) > 0:
+            sys.exit(1)
+        print("No regressions above %d%%." % round(options.threshold * 100))
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+"""Benchmark checking that the macrogenerator scales linearly with the input size
+
+Run from the src directory:
+    python3 -m benchmark.scaling [--max-size BYTES]
+"""
+
+from optparse import OptionParser
+import time
+
+from macrogenerator.macrogenerator import MacroGenerator
+
+HEADER = \
+    "#COURSE(NAME,SHORT,ECTS)\n" \
+    "{Course &NAME& (&SHORT&) is worth &ECTS& ECTS.}\n" \
+    "#SIGNATURE(ID){Kacper Wojakowski}\n"
+LINE = \
+    "Plain text line with some \\$ escaped symbols and $COURSE(Compiling Techniques,ECOTE,6)\n" \
+    "$SIGNATURE(293064) wrote this one.\n"
+
+SIZES = [10 * 1000, 100 * 1000, 1000 * 1000, 10 * 1000 * 1000, 100 * 1000 * 1000]
+
+def generate_input(size: int) -> str:
+    """Generates a macrogenerator input of (roughly) the given size
+
+    Args:
+        size (int):     requested size of the input in characters
+    """
+    repeats = max(1, (size - len(HEADER)) // len(LINE))
+    return HEADER + LINE * repeats
+
+def time_transform(source_text: str) -> float:
+    """Measures the time of a single transform run on a fresh MacroGenerator
+
+    Args:
+        source_text (str):  the text to be transformed
+    """
+    generator = MacroGenerator()
+    start = time.perf_counter()
+    generator.transform(source_text)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    opt_parser = OptionParser(usage="usage: %prog [options]")
+    opt_parser.add_option("-m", "--max-size", action="store", type="int", dest="max_size",
+                            default=SIZES[-1], help="largest input size to benchmark (in characters)")
+    (options, args) = opt_parser.parse_args()
+
+    print("%12s %10s %12s %10s" % ("size", "time [s]", "us/kchar", "ratio"))
+    base = None
+    for size in SIZES:
+        if size > options.max_size:
+            break
+        source_text = generate_input(size)
+        elapsed = time_transform(source_text)
+        per_kchar = elapsed / len(source_text) * 1000 * 1000 * 1000
+        if base is None:
+            base = per_kchar
+        # ratio close to 1.0 across sizes means linear scaling
+        print("%12d %10.3f %12.2f %10.2f" % (len(source_text), elapsed, per_kchar, per_kchar / base))
@@ -0,0 +1,199 @@
+#!/usr/bin/python3
+"""Benchmark suite timing the macrogenerator on synthetic workloads
+
+Every workload of benchmark.workloads is timed through MacroGenerator.transform and through
+the command line end-to-end, next to the operations of the macro library. Results are printed
+as a table and can be written as JSON, to be tracked over time. Given the JSON of an earlier run
+as a baseline, the suite exits with status 1 when any benchmark got slower by more than the threshold.
+
+Run from the src directory:
+    python3 -m benchmark.suite [--size CHARS] [--output results.json] [--baseline old.json]
+"""
+
+import gc
+import json
+from optparse import OptionParser
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark.workloads import WORKLOADS
+from macrogenerator.macro import Macro
+from macrogenerator.macrogenerator import MacroGenerator
+from macrogenerator.macrolibrary import MacroLibrary
+
+RESULTS_VERSION = 1
+DEFAULT_SIZE = 1000 * 1000
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.25
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+def measure(function, repeat: int) -> [float]:
+    """Measures the time of a function in seconds, once per repetition
+
+    Args:
+        function:       the function, called without arguments
+        repeat (int):   amount of repetitions
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+def result(name: str, size: int, times: [float]) -> dict:
+    """Summarizes the times of a benchmark
+
+    Args:
+        name (str):     name of the benchmark
+        size (int):     amount of characters or items processed by a single run
+        times ([float]):    the measured times in seconds
+    """
+    best = min(times)
+    return {
+        "name": name,
+        "size": size,
+        "best": best,
+        "median": statistics.median(times),
+        "us_per_kunit": best / max(size, 1) * 1000 * 1000 * 1000,
+    }
+
+def bench_transform(size: int, repeat: int, seed: int = 0) -> [dict]:
+    """Times MacroGenerator.transform on every workload
+    """
+    results = []
+    for (name, workload) in WORKLOADS.items():
+        source_text = workload(size, seed)
+        times = measure(lambda: MacroGenerator().transform(source_text), repeat)
+        results.append(result("transform/" + name, len(source_text), times))
+    return results
+
+def bench_library(count: int, repeat: int) -> [dict]:
+    """Times inserting macros into a library and looking them up
+    """
+    macros = [Macro("MACRO%d" % i, ["A"], "&A&") for i in range(count)]
+    def insert():
+        library = MacroLibrary()
+        for macro in macros:
+            library.insert_macro(macro)
+        return library
+    library = insert()
+    def lookup():
+        for macro in macros:
+            library.get_macro(macro.name)
+    return [result("library/insert", count, measure(insert, repeat)),
+            result("library/lookup", count, measure(lookup, repeat))]
+
+def bench_cli(size: int, repeat: int, seed: int = 0) -> [dict]:
+    """Times running main.py end-to-end, including interpreter startup, on every workload
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        output_file = os.path.join(directory, "output")
+        for (name, workload) in WORKLOADS.items():
+            input_file = os.path.join(directory, name)
+            with open(input_file, 'w') as file:
+                file.write(workload(size, seed))
+            command = [sys.executable, MAIN_SCRIPT, "-s", "--no-cache", input_file, output_file]
+            times = measure(lambda: subprocess.run(command, check=True, stdout=subprocess.DEVNULL), repeat)
+            results.append(result("cli/" + name, os.path.getsize(input_file), times))
+    return results
+
+def run_suite(size: int = DEFAULT_SIZE, repeat: int = DEFAULT_REPEAT, groups: [str] = None) -> dict:
+    """Runs the benchmarks
+
+    Args:
+        size (int):     size of the workloads in characters
+        repeat (int):   amount of repetitions of every benchmark, the best time is compared
+        groups ([str]): groups of benchmarks to run out of "transform", "library" and "cli", all if None
+
+    Returns:
+        dict:           the results, as written to JSON
+    """
+    if groups is None:
+        groups = ["transform", "library", "cli"]
+    results = []
+    if "transform" in groups:
+        results.extend(bench_transform(size, repeat))
+    if "library" in groups:
+        results.extend(bench_library(max(1, size // 10), repeat))
+    if "cli" in groups:
+        results.extend(bench_cli(size, repeat))
+    return {
+        "version": RESULTS_VERSION,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": size,
+        "repeat": repeat,
+        "results": results,
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> [(str, float)]:
+    """Finds the benchmarks which got slower than in the baseline by more than the threshold
+
+    Benchmarks are compared by their best time per unit, so that slightly different sizes still compare.
+
+    Args:
+        results (dict):     the current results
+        baseline (dict):    the results of an earlier run
+        threshold (float):  allowed slowdown, e.g. 0.25 for 25%
+
+    Returns:
+        list of pairs (str, float) of the names of regressed benchmarks and their slowdown ratios.
+    """
+    old = {entry["name"]: entry for entry in baseline["results"]}
+    regressions = []
+    for entry in results["results"]:
+        if entry["name"] not in old or old[entry["name"]]["us_per_kunit"] <= 0:
+            continue
+        ratio = entry["us_per_kunit"] / old[entry["name"]]["us_per_kunit"]
+        if ratio > 1 + threshold:
+            regressions.append((entry["name"], ratio))
+    return regressions
+
+if __name__ == "__main__":
+    opt_parser = OptionParser(usage="usage: %prog [options]")
+    opt_parser.add_option("-s", "--size", action="store", type="int", dest="size",
+                            default=DEFAULT_SIZE, help="size of the workloads (in characters)")
+    opt_parser.add_option("-r", "--repeat", action="store", type="int", dest="repeat",
+                            default=DEFAULT_REPEAT, help="repetitions of every benchmark")
+    opt_parser.add_option("-g", "--group", action="append", type="choice", dest="groups",
+                            choices=["transform", "library", "cli"],
+                            help="runs only a group of benchmarks: transform, library or cli, may be repeated")
+    opt_parser.add_option("-o", "--output", action="store", type="string", dest="output",
+                            help="writes the results as JSON to a file")
+    opt_parser.add_option("-b", "--baseline", action="store", type="string", dest="baseline",
+                            help="JSON results of an earlier run to compare with")
+    opt_parser.add_option("-t", "--threshold", action="store", type="float", dest="threshold",
+                            default=DEFAULT_THRESHOLD, help="allowed slowdown against the baseline, 0.25 by default")
+    (options, args) = opt_parser.parse_args()
+    if options.size < 1 or options.repeat < 1:
+        opt_parser.error("The size and the amount of repetitions have to be positive.")
+
+    results = run_suite(options.size, options.repeat, options.groups)
+
+    print("%-28s %12s %10s %10s %12s" % ("benchmark", "size", "best [s]", "median [s]", "us/kunit"))
+    for entry in results["results"]:
+        print("%-28s %12d %10.4f %10.4f %12.2f" % (entry["name"], entry["size"], entry["best"],
+                                                    entry["median"], entry["us_per_kunit"]))
+
+    if options.output != None:
+        with open(options.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if options.baseline != None:
+        with open(options.baseline, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, options.threshold)
+        for (name, ratio) in regressions:
+            print("Regression: %s is %.2fx slower than the baseline." % (name, ratio))
+        if len(regressions) > 0:
+            sys.exit(1)
+        print("No regressions above %d%%." % round(options.threshold * 100))
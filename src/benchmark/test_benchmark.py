@@ -0,0 +1,37 @@
+import unittest
+
+from . import memory
+from .suite import compare, run_suite
+from .workloads import WORKLOADS
+from macrogenerator.macrogenerator import MacroGenerator
+
+class TestBenchmark(unittest.TestCase):
+    """ Tests for the benchmark suite and its workloads
+    """
+    def test_workloads(self):
+        for (name, workload) in WORKLOADS.items():
+            text = workload(5000, 1)
+            self.assertEqual(text, workload(5000, 1))
+            self.assertGreaterEqual(len(text), 5000)
+            self.assertLess(len(text), 20000)
+            (out_str, out_log) = MacroGenerator().transform(text)
+            self.assertEqual(out_log, [], name)
+
+    def test_run(self):
+        results = run_suite(2000, 1, ["transform", "library"])
+        names = [entry["name"] for entry in results["results"]]
+        self.assertEqual(names, ["transform/" + name for name in WORKLOADS] + ["library/insert", "library/lookup"])
+        self.assertEqual(compare(results, results, 0.0), [])
+
+    def test_compare(self):
+        baseline = {"results": [{"name": "a", "us_per_kunit": 10.0}, {"name": "b", "us_per_kunit": 10.0}]}
+        results = {"results": [{"name": "a", "us_per_kunit": 12.0}, {"name": "b", "us_per_kunit": 13.0},
+                                {"name": "c", "us_per_kunit": 100.0}]}
+        self.assertEqual(compare(results, baseline, 0.25), [("b", 1.3)])
+
+    def test_memory(self):
+        results = memory.run_memory(2000)
+        sizes = {entry["name"]: entry["bytes_per_unit"] for entry in results["results"]}
+        self.assertEqual(list(sizes), ["macros/library", "warnings/transform", "records/log", "records/logrecord"])
+        self.assertLess(sizes["records/logrecord"], sizes["records/log"])
+        self.assertEqual(memory.compare(results, results, 0.0), [])
@@ -0,0 +1,95 @@
+"""Synthetic workloads for the benchmarks
+
+Every workload is a function of the requested size in characters and a seed,
+returning a valid macrogenerator input of roughly that size. The same size and seed
+always give the same text, so results of different runs can be compared.
+"""
+
+import random
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+ESCAPED = "\\#\\$\\&\\{\\}\\(\\)\\,\\\\"
+
+def words(rng: random.Random, count: int) -> str:
+    """Generates plain words separated by spaces
+
+    Args:
+        rng (Random):   the random generator
+        count (int):    amount of words
+    """
+    return " ".join("".join(rng.choice(ALPHABET) for _ in range(rng.randint(2, 9))) for _ in range(count))
+
+def repeat_until(size: int, header: str, generate_line) -> str:
+    """Appends generated lines to a header until the text reaches the given size
+
+    Args:
+        size (int):             requested size of the text in characters
+        header (str):           text at the start, e.g. the definitions
+        generate_line:          function of the line number returning the next line
+    """
+    lines = [header]
+    length = len(header)
+    number = 0
+    while length < size:
+        line = generate_line(number)
+        lines.append(line)
+        length = length + len(line)
+        number = number + 1
+    return "".join(lines)
+
+def many_definitions(size: int, seed: int = 0) -> str:
+    """Defines a new macro on every line and calls each one once"""
+    rng = random.Random(seed)
+    def line(number):
+        return "#DEF%d(A,B){%s &A& %s &B&}\n$DEF%d(%d,x)\n" % (number, words(rng, 2), words(rng, 2), number, number)
+    return repeat_until(size, "", line)
+
+def many_calls(size: int, seed: int = 0) -> str:
+    """Defines a few macros and calls them many times"""
+    rng = random.Random(seed)
+    header = "".join("#CALL%d(X){<%d &X&>}\n" % (i, i) for i in range(10))
+    def line(number):
+        return " ".join("$CALL%d(%d)" % (rng.randrange(10), number) for _ in range(8)) + "\n"
+    return repeat_until(size, header, line)
+
+def long_bodies(size: int, seed: int = 0) -> str:
+    """Defines macros with bodies of thousands of characters and calls them"""
+    rng = random.Random(seed)
+    def line(number):
+        body = " &P& ".join(words(rng, 40) for _ in range(10))
+        return "#LONG%d(P){%s}\n$LONG%d(%d)\n" % (number, body, number, number)
+    return repeat_until(size, "", line)
+
+def many_arguments(size: int, seed: int = 0) -> str:
+    """Defines a macro with fifty arguments and calls it on every line"""
+    rng = random.Random(seed)
+    names = ["ARG%d" % i for i in range(50)]
+    header = "#WIDE(%s){%s}\n" % (",".join(names), "-".join("&%s&" % name for name in names))
+    def line(number):
+        return "$WIDE(%s)\n" % ",".join(words(rng, 1) for _ in names)
+    return repeat_until(size, header, line)
+
+def escape_heavy(size: int, seed: int = 0) -> str:
+    """Text made mostly of escaped special symbols"""
+    rng = random.Random(seed)
+    def line(number):
+        return "".join(rng.choice([ESCAPED, words(rng, 1)]) for _ in range(12)) + "\n"
+    return repeat_until(size, "", line)
+
+def plain_text(size: int, seed: int = 0) -> str:
+    """Plain text with a rare macro call"""
+    rng = random.Random(seed)
+    def line(number):
+        if number % 100 == 0:
+            return "$PLAIN(%d)\n" % number
+        return words(rng, 12) + "\n"
+    return repeat_until(size, "#PLAIN(N){line &N&}\n", line)
+
+WORKLOADS = {
+    "many_definitions": many_definitions,
+    "many_calls": many_calls,
+    "long_bodies": long_bodies,
+    "many_arguments": many_arguments,
+    "escape_heavy": escape_heavy,
+    "plain_text": plain_text,
+}
@@ -1,6 +1,14 @@
 class Error():
     """Class for storing error/warning definitions
+
+    Attributes:
+        code (str):     code of the error/warning
+        name (str):     name of the error/warning
+        title (str):    code and name, the start of every description
+        verbose:        function of the arguments of a Log giving the verbose part of the description
     """
+    __slots__ = ("code", "name", "title", "verbose")
+
     def __init__(self, code: str, name: str):
         """
         Args:
@@ -9,6 +17,7 @@ class Error():
         """
         self.code = code
         self.name = name
+        self.title = code + " " + name
         self.verbose = lambda args: "No verbose version defined."
 
     def what_short(self, line: int) -> str:
@@ -18,10 +27,8 @@ class Error():
             line (int):     line at which the error/warning was encountered.
         """
         if line == None:
-            t = ""
-        else:
-            t = " at line " + str(line)
-        return self.code + " " + self.name + t + "."
+            return self.title + "."
+        return self.title + " at line " + str(line) + "."
 
     def what_long(self, line: int, args: [str]) -> str:     
         """Function (lambda in fact) generating a verbose description of the error/warning.
@@ -1,5 +1,8 @@
 class Log(Exception):
     """Class for storing the Logs of errors/warnings
+
+    Only the code, line and arguments are stored, the message is formatted
+    by the error library when the log is rendered.
     """
     def __init__(self, err_code: str, line: int, args: [str]):
         """
@@ -11,4 +14,9 @@ class Log(Exception):
         """
         self.err_code = err_code
         self.line = line
-        self.args = args
\ No newline at end of file
+        self.args = args
+
+    def __str__(self) -> str:
+        # imported here, the error library depends on this module
+        from .errorlibrary import get_error_lib
+        return get_error_lib().what_short(self)
@@ -0,0 +1,28 @@
+class LogRecord():
+    """Class for storing the Logs of warnings
+
+    Unlike Log, which is raised for errors, a record is a plain object without the state
+    of an exception, so that many warnings can be kept in memory cheaply.
+    It has the same attributes as Log and is described by the error library the same way.
+    """
+    __slots__ = ("err_code", "line", "args")
+
+    def __init__(self, err_code: str, line: int, args: (str,)):
+        """
+        Args:
+            err_code (str):     code of the warning encountered
+            line (int):         line at which the warning was encountered
+            args ((str,)):      additional arguments used to produce the verbose description
+                                    e.g. macro name, stored as a tuple like the arguments of a Log
+        """
+        self.err_code = err_code
+        self.line = line
+        self.args = tuple(args)
+
+    def __repr__(self) -> str:
+        return "LogRecord(%r, %r, %r)" % (self.err_code, self.line, self.args)
+
+    def __str__(self) -> str:
+        # imported here, the error library depends on the logs
+        from .errorlibrary import get_error_lib
+        return get_error_lib().what_short(self)
@@ -0,0 +1,25 @@
+import unittest
+from .errorlibrary import *
+
+class TestErrorLibrary(unittest.TestCase):
+    """ Tests for the ErrorLibrary class
+    """
+    def test_shared(self):
+        self.assertIs(get_error_lib(), get_error_lib())
+        self.assertIsNot(build_error_lib(), get_error_lib())
+
+    def test_index(self):
+        lib = get_error_lib()
+        self.assertEqual([er.code for er in lib.library], list(lib.errors))
+        self.assertEqual(lib.get_error("w21").name, "Empty Argument")
+        with self.assertRaises(ErrorLibException):
+            lib.get_error("x00")
+        with self.assertRaises(ErrorLibException):
+            lib.add_error(Error("w21", "Repeated"))
+
+    def test_describe(self):
+        lib = get_error_lib()
+        log = Log("w22", 3, ["M", " x"])
+        self.assertEqual(lib.what_short(log), "w22 Whitespace Argument at line 3.")
+        self.assertEqual(lib.what_long(Log("e98", None, ["gone"])),
+                            "e98 I/O Error. There was an error with file I/O: gone.")
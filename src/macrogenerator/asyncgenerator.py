@@ -0,0 +1,250 @@
+"""Module macrogenerator.asyncgenerator
+
+This module lets asyncio applications transform text without blocking their event loop.
+
+Expansions run in worker threads, at most a given amount at once. The input is fed to the
+streaming transform in chunks and the worker checks between chunks whether the expansion is still
+awaited, so a cancelled or timed out expansion stops within a chunk instead of running to the end.
+"""
+
+import asyncio
+import codecs
+import concurrent.futures
+import inspect
+import io
+import threading
+
+from .macrogenerator import MacroGenerator
+from .macrolibrary import MacroLibrary
+from error.logrecord import LogRecord
+from symbol.symbolset import DEFAULT_SYMBOLS, SymbolSet
+
+DEFAULT_CHUNK_SIZE = 65536
+
+class ExpansionCancelled(Exception):
+    """Exception stopping a worker whose expansion was cancelled or timed out.
+    Used internally, the awaiting task sees asyncio.CancelledError or asyncio.TimeoutError instead.
+    """
+
+class Cancellation():
+    """ Class telling a worker thread that its expansion is no longer awaited
+
+    Attributes:
+        event (threading.Event):    set once the expansion is cancelled
+        pending (Future):           the coroutine the worker is waiting for on the event loop, None if there is none
+    """
+    def __init__(self):
+        self.event = threading.Event()
+        self.pending = None
+
+    def cancel(self) -> None:
+        """ Cancels the expansion, including the coroutine the worker is waiting for
+        """
+        self.event.set()
+        pending = self.pending
+        if pending is not None:
+            pending.cancel()
+
+    def check(self) -> None:
+        """ Can throw ExpansionCancelled if the expansion was cancelled
+        """
+        if self.event.is_set():
+            raise ExpansionCancelled()
+
+    def wait(self, loop: asyncio.AbstractEventLoop, function, *args):
+        """ Runs a coroutine function on the event loop and waits for its result in the worker thread
+
+        Can throw ExpansionCancelled if the expansion is cancelled before or while waiting.
+
+        Args:
+            loop (AbstractEventLoop):   the event loop
+            function:                   the coroutine function
+            args:                       the arguments of the function
+        """
+        self.check()
+        future = asyncio.run_coroutine_threadsafe(function(*args), loop)
+        self.pending = future
+        try:
+            # cancel() may have run before the future was visible to it
+            if self.event.is_set():
+                future.cancel()
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise ExpansionCancelled()
+        finally:
+            self.pending = None
+
+class TextReader():
+    """ Class reading a string in chunks, stopping once the expansion is cancelled
+    """
+    def __init__(self, source_text: str, cancellation: Cancellation):
+        self.source_text = source_text
+        self.cancellation = cancellation
+        self.pos = 0
+
+    def read(self, size: int) -> str:
+        self.cancellation.check()
+        chunk = self.source_text[self.pos:self.pos + size]
+        self.pos = self.pos + len(chunk)
+        return chunk
+
+class AsyncReaderBridge():
+    """ Class reading an asynchronous reader from a worker thread
+
+    The reader has a coroutine read(size) returning str, or bytes if an encoding is given.
+    """
+    def __init__(self, reader, loop: asyncio.AbstractEventLoop, cancellation: Cancellation, encoding: str = None):
+        self.reader = reader
+        self.loop = loop
+        self.cancellation = cancellation
+        self.decoder = None if encoding is None else codecs.getincrementaldecoder(encoding)()
+
+    def read(self, size: int) -> str:
+        while True:
+            data = self.cancellation.wait(self.loop, self.reader.read, size)
+            if self.decoder is None:
+                return data
+            final = len(data) == 0
+            text = self.decoder.decode(data, final)
+            # an empty string would end the input, so wait for the rest of a split character
+            if text != "" or final:
+                return text
+
+class AsyncWriterBridge():
+    """ Class writing to an asynchronous writer from a worker thread
+
+    The write(data) method of the writer is either a coroutine, as in aiohttp responses,
+    or a plain method followed by the coroutine drain(), as in asyncio.StreamWriter.
+    """
+    def __init__(self, writer, loop: asyncio.AbstractEventLoop, cancellation: Cancellation, encoding: str = None):
+        self.writer = writer
+        self.loop = loop
+        self.cancellation = cancellation
+        self.encoding = encoding
+
+    def write(self, text: str) -> None:
+        if text == "":
+            return
+        data = text if self.encoding is None else text.encode(self.encoding)
+        self.cancellation.wait(self.loop, self.__write, data)
+
+    async def __write(self, data) -> None:
+        result = self.writer.write(data)
+        if inspect.isawaitable(result):
+            await result
+        elif hasattr(self.writer, "drain"):
+            await self.writer.drain()
+
+class AsyncMacroGenerator():
+    """ Class transforming text for asyncio applications, off the event loop and with bounded concurrency
+
+    All the expansions share a single MacroGenerator, every one running in its own ExpansionContext.
+
+    Attributes:
+        prelude (MacroLibrary):         frozen library of macros available to every input, None if there is none
+        report_prelude_unused (bool):   whether w12 is reported for the macros of the prelude
+        timeout (float):                default seconds after which an expansion is cancelled, None for no limit
+        chunk_size (int):               amount of characters processed between checks for cancellation
+        generator (MacroGenerator):     the generator running the expansions
+        executor (ThreadPoolExecutor):  the worker threads
+        semaphore (asyncio.Semaphore):  the free slots for expansions, the generator is used from a single event loop
+    """
+    def __init__(self, prelude: MacroLibrary = None, report_prelude_unused: bool = False,
+                    max_concurrency: int = 4, timeout: float = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    symbols: SymbolSet = DEFAULT_SYMBOLS):
+        """
+        Args:
+            prelude (MacroLibrary):         library of macros available to every input, e.g. from load_prelude
+            report_prelude_unused (bool):   whether w12 is reported for the macros of the prelude
+            max_concurrency (int):          maximal amount of expansions running at once, the others wait
+            timeout (float):                default seconds after which an expansion is cancelled, None for no limit
+            chunk_size (int):               amount of characters processed between checks for cancellation
+            symbols (SymbolSet):            the special symbols of the syntax
+        """
+        self.prelude = prelude
+        self.report_prelude_unused = report_prelude_unused
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.generator = MacroGenerator(prelude, report_prelude_unused, symbols=symbols)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self) -> "AsyncMacroGenerator":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """ Stops the worker threads once the running expansions finish
+        """
+        self.executor.shutdown(wait=False)
+
+    async def transform_async(self, source_text: str, timeout: float = None) -> (str, [LogRecord]):
+        """ Transforms text in a worker thread
+
+        Can throw a Log object when an error occurs, asyncio.TimeoutError when the expansion takes too long.
+
+        Args:
+            source_text (str):  the text to be transformed
+            timeout (float):    seconds after which the expansion is cancelled, self.timeout if None
+
+        Returns:
+            a pair (str, [LogRecord]), where the string is the resulting transforming text,
+            and the list of Logs are warnings encountered during execution.
+        """
+        def expand(loop, cancellation):
+            writer = io.StringIO()
+            logs = self.generator.transform_stream(TextReader(source_text, cancellation), writer, self.chunk_size)
+            return writer.getvalue(), logs
+
+        return await self.__run(expand, timeout)
+
+    async def transform_stream_async(self, reader, writer, timeout: float = None, encoding: str = None) -> [LogRecord]:
+        """ Transforms text read from an asynchronous reader in a worker thread
+
+        The resulting text is written as soon as each chunk is processed, see MacroGenerator.transform_stream.
+
+        Can throw a Log object when an error occurs, asyncio.TimeoutError when the expansion takes too long.
+
+        Args:
+            reader:             object with a coroutine read(size), returning an empty string or bytes at the end,
+                                e.g. asyncio.StreamReader or aiohttp's request.content
+            writer:             object with a coroutine write(data), e.g. aiohttp's StreamResponse,
+                                or with write(data) and a coroutine drain(), e.g. asyncio.StreamWriter
+            timeout (float):    seconds after which the expansion is cancelled, self.timeout if None
+            encoding (str):     encoding of bytes read from the reader and written to the writer,
+                                None if both use str
+
+        Returns:
+            [LogRecord]:        warnings encountered during execution.
+        """
+        def expand(loop, cancellation):
+            return self.generator.transform_stream(AsyncReaderBridge(reader, loop, cancellation, encoding),
+                                                        AsyncWriterBridge(writer, loop, cancellation, encoding),
+                                                        self.chunk_size)
+
+        return await self.__run(expand, timeout)
+
+    async def __run(self, expand, timeout: float):
+        """ Function running an expansion in a worker thread once a slot is free
+
+        The slot is kept until the worker actually stops, also after cancellation,
+        so that no more than max_concurrency expansions ever run at once.
+
+        Args:
+            expand:             function of the event loop and the Cancellation, run in the worker
+            timeout (float):    seconds after which the expansion is cancelled, self.timeout if None
+        """
+        loop = asyncio.get_running_loop()
+        if timeout is None:
+            timeout = self.timeout
+        async with self.semaphore:
+            cancellation = Cancellation()
+            future = loop.run_in_executor(self.executor, expand, loop, cancellation)
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+            except BaseException:
+                cancellation.cancel()
+                await asyncio.gather(future, return_exceptions=True)
+                raise
@@ -0,0 +1,151 @@
+"""Module macrogenerator.batch
+
+This module expands many files at once, spreading them across processes.
+Every file is transformed by its own MacroGenerator.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import os
+
+from .macrogenerator import MacroGenerator
+from .macrolibrary import MacroLibrary
+from .outputsink import open_file_sink
+from error.log import Log
+from error.logrecord import LogRecord
+from symbol.symbolset import DEFAULT_SYMBOLS, SymbolSet
+
+MANIFEST_PREFIX = '@'
+
+# prelude and syntax of the current process, set by init_worker
+worker_prelude = None
+worker_report_prelude_unused = False
+worker_symbols = DEFAULT_SYMBOLS
+worker_max_warnings = None
+
+class BatchResult():
+    """ Class storing the result of expanding a single file
+
+    Attributes:
+        input_file (str):   path of the expanded file
+        output_file (str):  path of the file the result was written to
+        logs [LogRecord]:   warnings encountered during execution
+        error (Log):        the error which stopped the execution, None if it was successful
+        warnings_dropped (int): amount of warnings past the limit of warnings kept, only counted
+    """
+    def __init__(self, input_file: str, output_file: str, logs: [LogRecord], error: Log, warnings_dropped: int = 0):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.logs = logs
+        self.error = error
+        self.warnings_dropped = warnings_dropped
+
+def collect_inputs(specs: [str]) -> [str]:
+    """ Gets the sorted list of input files given directories, glob patterns or manifests
+
+    A directory stands for all the files inside it, a manifest is a file listing one input path per line,
+    given with the MANIFEST_PREFIX, e.g. @files.txt. Anything else is a glob pattern.
+
+    Args:
+        specs ([str]):      the directories, glob patterns and manifests
+    """
+    inputs = set()
+    for spec in specs:
+        if spec.startswith(MANIFEST_PREFIX):
+            with open(spec[len(MANIFEST_PREFIX):], 'r') as manifest:
+                inputs.update(line.strip() for line in manifest if line.strip() != "")
+        elif os.path.isdir(spec):
+            for root, dirs, files in os.walk(spec):
+                inputs.update(os.path.join(root, name) for name in files)
+        else:
+            inputs.update(path for path in glob.glob(spec, recursive=True) if os.path.isfile(path))
+    return sorted(inputs)
+
+def plan_outputs(inputs: [str], output_dir: str) -> [(str, str)]:
+    """ Pairs every input file with the path of its output file
+
+    The outputs keep the layout of the inputs relative to their common directory.
+
+    Args:
+        inputs ([str]):     the input files
+        output_dir (str):   directory to write the outputs to
+    """
+    if len(inputs) == 0:
+        return []
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in inputs])
+    return [(path, os.path.join(output_dir, os.path.relpath(os.path.abspath(path), base))) for path in inputs]
+
+def init_worker(prelude: MacroLibrary, report_prelude_unused: bool, symbols: SymbolSet = DEFAULT_SYMBOLS,
+                max_warnings: int = None) -> None:
+    """ Stores the prelude used by expand_file in the current process, so that it is sent to every worker once
+
+    Args:
+        prelude (MacroLibrary):         frozen library of macros available to every file, None if there is none
+        report_prelude_unused (bool):   whether w12 is reported for the macros of the prelude
+        symbols (SymbolSet):            the special symbols of the syntax
+        max_warnings (int):             amount of warnings kept for every file, None for no limit
+    """
+    global worker_prelude, worker_report_prelude_unused, worker_symbols, worker_max_warnings
+    worker_prelude = prelude
+    worker_report_prelude_unused = report_prelude_unused
+    worker_symbols = symbols
+    worker_max_warnings = max_warnings
+
+def expand_file(job: (str, str)) -> (str, str, [tuple], tuple, int):
+    """ Expands a single file with a new MacroGenerator, using the prelude set by init_worker
+
+    Logs are returned as tuples, so that they can be sent back from a worker process,
+    followed by the amount of warnings past the limit, which are only counted.
+
+    Args:
+        job ((str, str)):   paths of the input and the output file
+    """
+    (input_file, output_file) = job
+    try:
+        with open(input_file, 'r') as file:
+            input_str = file.read()
+        generator = MacroGenerator(worker_prelude, worker_report_prelude_unused, symbols=worker_symbols,
+                                    max_warnings=worker_max_warnings)
+        output_dir = os.path.dirname(output_file)
+        if output_dir != "":
+            os.makedirs(output_dir, exist_ok=True)
+        with open_file_sink(output_file) as sink:
+            logs = generator.transform_to(input_str, sink)
+    except Log as e:
+        return input_file, output_file, [], (e.err_code, e.line, e.args), 0
+    except OSError as e:
+        return input_file, output_file, [], ("e98", None, [str(e.strerror)]), 0
+    except ValueError as e:
+        # e.g. UnicodeDecodeError of an input which is not text
+        return input_file, output_file, [], ("e98", None, [str(e)]), 0
+    return (input_file, output_file, [(log.err_code, log.line, log.args) for log in logs], None,
+            generator.context.warnings_dropped)
+
+def run_batch(jobs: [(str, str)], workers: int = None, prelude: MacroLibrary = None,
+                report_prelude_unused: bool = False, symbols: SymbolSet = DEFAULT_SYMBOLS,
+                max_warnings: int = None) -> [BatchResult]:
+    """ Expands the files in a pool of processes
+
+    Args:
+        jobs ([(str, str)]):    paths of the input and the output files
+        workers (int):          amount of processes, all available cores if None,
+                                the files are expanded in the current process if 1
+        prelude (MacroLibrary): frozen library of macros available to every file, None if there is none
+        report_prelude_unused (bool): whether w12 is reported for the macros of the prelude
+        symbols (SymbolSet):    the special symbols of the syntax
+        max_warnings (int):     amount of warnings kept for every file, the following ones are only counted
+                                in BatchResult.warnings_dropped, None for no limit
+
+    Returns:
+        [BatchResult]:          results in the order of the jobs
+    """
+    if workers == 1:
+        init_worker(prelude, report_prelude_unused, symbols, max_warnings)
+        raw_results = list(map(expand_file, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                    initargs=(prelude, report_prelude_unused, symbols, max_warnings)) as executor:
+            raw_results = list(executor.map(expand_file, jobs))
+    return [BatchResult(input_file, output_file, [LogRecord(*log) for log in logs], None if error is None else Log(*error),
+                        dropped)
+                for (input_file, output_file, logs, error, dropped) in raw_results]
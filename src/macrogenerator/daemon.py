@@ -0,0 +1,313 @@
+"""Module macrogenerator.daemon
+
+This module keeps a macrogenerator running between expansions, so that the interpreter,
+the prelude and the compiled macros of every file are set up only once.
+
+Files are expanded on demand, either when they change on disk or when requested over a Unix socket.
+Every request is a single line of JSON, e.g. {"input": "page.in", "output": "page.html"},
+answered with a single line of JSON with the same paths and the logs, where every log is
+a list [err_code, line, args] and error is null unless the expansion failed.
+The request {"shutdown": true} stops the server.
+"""
+
+from collections import OrderedDict
+import errno
+import json
+import os
+import socket
+import socketserver
+import stat
+import time
+
+from .batch import BatchResult
+from .incremental import IncrementalGenerator
+from .librarycache import LibraryCache
+from .macrogenerator import load_prelude
+from .outputsink import open_file_sink
+from error.log import Log
+from error.logrecord import LogRecord
+from symbol.symbolset import DEFAULT_SYMBOLS, SymbolSet
+
+REQUEST_ENCODING = "utf-8"
+DEFAULT_MAX_GENERATORS = 64
+
+class Daemon():
+    """ Class expanding files on demand, keeping the prelude and the generator of every file in memory
+
+    Every input file has its own IncrementalGenerator, so an edited file is re-expanded incrementally.
+    Only the generators of the most recently expanded files are kept, and the one of a file that
+    cannot be read is dropped. The prelude is reloaded, and the generators dropped, whenever the prelude file changes.
+
+    Attributes:
+        prelude_file (str):             path of the file with the prelude, None if there is none
+        report_prelude_unused (bool):   whether w12 is reported for the macros of the prelude
+        cache (LibraryCache):           cache of compiled preludes, None to always parse the prelude
+        symbols (SymbolSet):            the special symbols of the syntax of the prelude and the inputs
+        prelude (MacroLibrary):         the loaded prelude, None if there is none or it is not loaded yet
+        prelude_logs ([LogRecord]): warnings encountered in the prelude
+        prelude_version (int):          incremented whenever the prelude is reloaded
+        max_generators (int):           amount of generators kept
+        generators {str: IncrementalGenerator}: generator of every input file expanded recently,
+                                                least recently expanded first
+    """
+    def __init__(self, prelude_file: str = None, report_prelude_unused: bool = False, cache: LibraryCache = None,
+                    symbols: SymbolSet = DEFAULT_SYMBOLS, max_generators: int = DEFAULT_MAX_GENERATORS):
+        """
+        Args:
+            prelude_file (str):             path of the file with the prelude, None if there is none
+            report_prelude_unused (bool):   whether w12 is reported for the macros of the prelude
+            cache (LibraryCache):           cache of compiled preludes, None to always parse the prelude
+            symbols (SymbolSet):            the special symbols of the syntax of the prelude and the inputs
+            max_generators (int):           amount of generators kept, each holds the source, the output
+                                            and the pieces of its file
+        """
+        self.prelude_file = prelude_file
+        self.report_prelude_unused = report_prelude_unused
+        self.cache = cache
+        self.symbols = symbols
+        self.prelude = None
+        self.prelude_logs = []
+        self.prelude_version = 0
+        self.max_generators = max_generators
+        self.generators = OrderedDict()
+        self.__prelude_stamp = None
+
+    def load_prelude(self) -> [LogRecord]:
+        """ Loads the prelude, unless it is already loaded and did not change since
+
+        Can throw a Log object when an error occurs in the prelude and OSError when it cannot be read.
+
+        Returns:
+            [LogRecord]:        warnings encountered in the prelude, empty if it was already loaded.
+        """
+        if self.prelude_file is None:
+            return []
+        status = os.stat(self.prelude_file)
+        stamp = (status.st_mtime_ns, status.st_size)
+        if stamp == self.__prelude_stamp:
+            return []
+
+        with open(self.prelude_file, 'r') as file:
+            prelude_str = file.read()
+        if self.cache is not None:
+            (self.prelude, self.prelude_logs) = self.cache.load_prelude(prelude_str, self.symbols)
+        else:
+            (self.prelude, self.prelude_logs) = load_prelude(prelude_str, self.symbols)
+        self.__prelude_stamp = stamp
+        self.prelude_version = self.prelude_version + 1
+        self.generators = OrderedDict()
+        return self.prelude_logs
+
+    def expand(self, input_file: str, output_file: str) -> BatchResult:
+        """ Expands a single file
+
+        Args:
+            input_file (str):   path of the file to be expanded
+            output_file (str):  path of the file the result is written to
+
+        Returns:
+            BatchResult:        the result, with the error of the prelude if it cannot be loaded.
+        """
+        try:
+            self.load_prelude()
+        except Log as e:
+            self.__prelude_stamp = None
+            return BatchResult(self.prelude_file, output_file, [], e)
+        except OSError as e:
+            self.__prelude_stamp = None
+            return BatchResult(self.prelude_file, output_file, [], Log("e98", None, [str(e.strerror)]))
+
+        try:
+            with open(input_file, 'r') as file:
+                input_str = file.read()
+        except (OSError, ValueError) as e:
+            # the file is gone or is not text, so its generator is of no use anymore
+            self.generators.pop(input_file, None)
+            return BatchResult(input_file, output_file, [], Log("e98", None, [error_string(e)]))
+
+        generator = self.generators.get(input_file)
+        if generator is None:
+            generator = IncrementalGenerator(self.prelude, self.report_prelude_unused, self.symbols)
+            self.generators[input_file] = generator
+            if len(self.generators) > self.max_generators:
+                self.generators.popitem(last=False)
+        else:
+            self.generators.move_to_end(input_file)
+        try:
+            (output_str, logs) = generator.transform(input_str)
+            output_dir = os.path.dirname(output_file)
+            if output_dir != "":
+                os.makedirs(output_dir, exist_ok=True)
+            with open_file_sink(output_file) as sink:
+                sink.write(output_str)
+        except Log as e:
+            return BatchResult(input_file, output_file, [], e)
+        except OSError as e:
+            return BatchResult(input_file, output_file, [], Log("e98", None, [error_string(e)]))
+        return BatchResult(input_file, output_file, logs, None)
+
+    def watch(self, jobs: [(str, str)], report, interval: float = 0.5, rounds: int = None) -> None:
+        """ Expands the files whenever they, or the prelude, change on disk
+
+        Every file is expanded once at the start.
+
+        Args:
+            jobs ([(str, str)]):    paths of the input and the output files
+            report:                 function called with the BatchResult of every expansion
+            interval (float):       seconds between checks of the files
+            rounds (int):           amount of checks before returning, None to watch forever
+        """
+        stamps = {}
+        while True:
+            version = self.__current_prelude_version()
+            for (input_file, output_file) in jobs:
+                try:
+                    status = os.stat(input_file)
+                    stamp = (status.st_mtime_ns, status.st_size, version)
+                except OSError:
+                    stamp = None
+                if input_file not in stamps or stamps[input_file] != stamp:
+                    stamps[input_file] = stamp
+                    report(self.expand(input_file, output_file))
+            if rounds is not None:
+                rounds = rounds - 1
+                if rounds <= 0:
+                    return
+            time.sleep(interval)
+
+    def serve(self, socket_path: str) -> None:
+        """ Answers requests over a Unix socket until a shutdown request is received
+
+        Requests are answered one at a time, in the order they arrive.
+
+        Can throw OSError when the socket cannot be created, e.g. when something other than a socket is at its path.
+
+        Args:
+            socket_path (str):  path of the socket, replaced if it is an old socket
+        """
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        request = json.loads(line.decode(REQUEST_ENCODING))
+                        if request.get("shutdown"):
+                            self.server.running = False
+                            response = {"shutdown": True}
+                        else:
+                            result = daemon.expand(request["input"], request["output"])
+                            response = result_to_json(result)
+                    except (ValueError, KeyError, TypeError, AttributeError) as e:
+                        response = {"invalid": str(e)}
+                    self.wfile.write(json.dumps(response).encode(REQUEST_ENCODING) + b"\n")
+                    self.wfile.flush()
+                    if not self.server.running:
+                        return
+
+        if is_socket(socket_path):
+            os.remove(socket_path)
+        elif os.path.lexists(socket_path):
+            # anything else at the path is most likely a mistyped path, it is never removed
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), socket_path)
+        with socketserver.UnixStreamServer(socket_path, Handler) as server:
+            server.running = True
+            try:
+                while server.running:
+                    server.handle_request()
+            finally:
+                if is_socket(socket_path):
+                    os.remove(socket_path)
+
+    def __current_prelude_version(self) -> int:
+        """ Function reloading the prelude if it changed, the version of the prelude is returned
+        """
+        try:
+            self.load_prelude()
+        except (Log, OSError):
+            self.__prelude_stamp = None
+        return self.prelude_version
+
+def is_socket(path: str) -> bool:
+    """ Checks whether a path is a socket, without following symbolic links
+    """
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except OSError:
+        return False
+
+def error_string(error: Exception) -> str:
+    """ Gets the description of an error reading or writing a file, for e98
+    """
+    if isinstance(error, OSError):
+        return str(error.strerror)
+    return str(error)
+
+def result_to_json(result: BatchResult) -> dict:
+    """ Converts the result of an expansion to the object sent in a response
+    """
+    error = None
+    if result.error is not None:
+        error = [result.error.err_code, result.error.line, list(result.error.args)]
+    return {
+        "input": result.input_file,
+        "output": result.output_file,
+        "logs": [[log.err_code, log.line, list(log.args)] for log in result.logs],
+        "error": error,
+    }
+
+def result_from_json(response: dict) -> BatchResult:
+    """ Converts the object received in a response to the result of an expansion
+    """
+    error = response["error"]
+    return BatchResult(response["input"], response["output"], [LogRecord(*log) for log in response["logs"]],
+                        None if error is None else Log(*error))
+
+def send_requests(socket_path: str, jobs: [(str, str)]) -> [BatchResult]:
+    """ Asks a running Daemon to expand files
+
+    Can throw OSError when the daemon cannot be reached.
+
+    Args:
+        socket_path (str):      path of the socket of the daemon
+        jobs ([(str, str)]):    paths of the input and the output files, made absolute before sending
+
+    Returns:
+        [BatchResult]:          results in the order of the jobs
+    """
+    results = []
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        with client.makefile('rwb') as stream:
+            for (input_file, output_file) in jobs:
+                request = {"input": os.path.abspath(input_file), "output": os.path.abspath(output_file)}
+                stream.write(json.dumps(request).encode(REQUEST_ENCODING) + b"\n")
+                stream.flush()
+                response = json.loads(stream.readline().decode(REQUEST_ENCODING))
+                if "invalid" in response:
+                    # the daemon could not handle the request at all
+                    results.append(BatchResult(input_file, output_file, [],
+                                                Log("e98", None, [str(response["invalid"])])))
+                    continue
+                result = result_from_json(response)
+                # report the paths the way they were given
+                if result.input_file == request["input"]:
+                    result.input_file = input_file
+                result.output_file = output_file
+                results.append(result)
+    return results
+
+def shutdown(socket_path: str) -> None:
+    """ Stops a running Daemon
+
+    Can throw OSError when the daemon cannot be reached.
+
+    Args:
+        socket_path (str):      path of the socket of the daemon
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        with client.makefile('rwb') as stream:
+            stream.write(json.dumps({"shutdown": True}).encode(REQUEST_ENCODING) + b"\n")
+            stream.flush()
+            stream.readline()
@@ -0,0 +1,91 @@
+"""Module macrogenerator.expansioncache
+
+This module memoizes the expansions of macro calls.
+
+An expansion depends only on the called macro and the values of its arguments, so it is stored
+under the Macro object itself and the tuple of the arguments. Macros are compared by identity:
+a macro defined again, in another run or another version of an incremental input, is a new object,
+so the expansions of the old definition are never returned for it and simply age out of the cache.
+"""
+
+from collections import OrderedDict
+import threading
+
+DEFAULT_CACHE_SIZE = 4096
+
+class ExpansionCache():
+    """ Class keeping the most recently used expansions of macro calls, up to a bounded amount
+
+    Every entry holds the resulting text and the warnings of the call as pairs of the code and the arguments,
+    so that they can be reported again at the line of every call. The cache can be shared by many runs
+    and threads, e.g. of one MacroGenerator.
+
+    Attributes:
+        max_size (int):     maximal amount of expansions kept
+        hits (int):         amount of calls whose expansion was found
+        misses (int):       amount of calls whose expansion was not found
+    """
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            max_size (int):     maximal amount of expansions kept, the least recently used ones are dropped
+        """
+        if max_size < 1:
+            raise ValueError("The size of the cache has to be positive")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, macro, args: tuple) -> (str, tuple):
+        """ Looks up the expansion of a call, counting a hit or a miss
+
+        Args:
+            macro (Macro):      the called macro
+            args (tuple):       values of the arguments
+
+        Returns:
+            (str, tuple):       the resulting text and the warnings of the call, None if it is not cached
+        """
+        key = (macro, args)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.misses = self.misses + 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits = self.hits + 1
+            return entry
+
+    def put(self, macro, args: tuple, expansion: str, warnings: tuple) -> None:
+        """ Stores the expansion of a call, dropping the least recently used one when the cache is full
+
+        Args:
+            macro (Macro):      the called macro
+            args (tuple):       values of the arguments
+            expansion (str):    the resulting text
+            warnings (tuple):   warnings of the call, pairs of the code and the arguments of the LogRecord
+        """
+        with self.__lock:
+            self.__entries[(macro, args)] = (expansion, warnings)
+            self.__entries.move_to_end((macro, args))
+            if len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """ Drops all expansions and resets the counters
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_hit_rate(self) -> float:
+        """ Gets the share of calls whose expansion was found, 0 if there were none
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
@@ -0,0 +1,62 @@
+from .expansionstats import ExpansionStats
+from .macrolibrary import MacroLibrary
+
+class ExpansionContext():
+    """ Class storing the state of a single run of a MacroGenerator
+
+    A new context is created for every transform, so that runs never share state
+    and a single MacroGenerator can be used by many threads at once.
+
+    Attributes:
+        macro_library (MacroLibrary):   the macros defined so far, extending the prelude
+        call_counts {str: int}:         number of calls of each macro that was called at least once
+        line (int):                     the line currently processed
+        last_macro (Macro):             the macro defined or called most recently
+        stats (ExpansionStats):         timers and counters of the run, None if they are not collected
+        max_warnings (int):             amount of warnings kept, the following ones are only counted, None for no limit
+        warnings_kept (int):            amount of warnings kept so far
+        warnings_dropped (int):         amount of warnings past max_warnings
+    """
+    def __init__(self, macro_library: MacroLibrary, stats: ExpansionStats = None, max_warnings: int = None):
+        """
+        Args:
+            macro_library (MacroLibrary):   library receiving the definitions of the run
+            stats (ExpansionStats):         timers and counters of the run, None if they are not collected
+            max_warnings (int):             amount of warnings kept, None for no limit
+        """
+        self.macro_library = macro_library
+        self.call_counts = {}
+        self.line = 1
+        self.last_macro = None
+        self.stats = stats
+        self.max_warnings = max_warnings
+        self.warnings_kept = 0
+        self.warnings_dropped = 0
+
+    def admit_warning(self) -> bool:
+        """ Counts a warning of the run
+
+        Returns:
+            bool:   whether the warning is kept, False once max_warnings warnings were kept
+        """
+        if self.max_warnings is not None and self.warnings_kept >= self.max_warnings:
+            self.warnings_dropped = self.warnings_dropped + 1
+            return False
+        self.warnings_kept = self.warnings_kept + 1
+        return True
+
+    def get_call_counts(self) -> {str: int}:
+        """ Gets the number of calls of each defined macro, including the ones never called
+        """
+        return {macro.name: self.call_counts.get(macro.name, 0) for macro in self.macro_library.library}
+
+    def get_hot_macros(self, count: int) -> [(str, int)]:
+        """ Gets the most frequently called macros
+
+        Args:
+            count (int):        maximal amount of macros to return
+
+        Returns:
+            list of pairs (str, int) of macro names and call counts, most called first.
+        """
+        return sorted(self.call_counts.items(), key=lambda item: item[1], reverse=True)[:count]
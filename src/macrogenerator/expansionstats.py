@@ -0,0 +1,141 @@
+PHASE_TOTAL = "total"                   # the whole run
+PHASE_DEFINITIONS = "definitions"       # parsing and validating definitions
+PHASE_CALLS = "calls"                   # parsing calls and their arguments
+PHASE_SUBSTITUTION = "substitution"     # substituting the arguments into the bodies
+PHASE_WARNINGS = "warnings"             # reporting unused macros
+PHASE_IO = "io"                         # reading and writing the streams of transform_stream and transform_to
+PHASE_TEXT = "text"                     # the rest of the run, i.e. scanning text and escapes
+
+# phases timed by the run itself, the phases added by callers follow them in reports
+RUN_PHASES = [PHASE_TOTAL, PHASE_DEFINITIONS, PHASE_CALLS, PHASE_SUBSTITUTION, PHASE_WARNINGS, PHASE_IO]
+
+class ExpansionStats():
+    """ Class collecting timers and counters of a single run of a MacroGenerator
+
+    Phases are timed with time.perf_counter, the run itself only times its own phases,
+    callers may add their own, e.g. reading the input.
+
+    Attributes:
+        phases {str: float}:        seconds spent in each phase
+        chars_scanned (int):        amount of characters of the input processed, bytes for mapped input
+        chars_emitted (int):        amount of characters of the output, bytes for mapped input
+        macros_defined (int):       amount of macro definitions
+        calls_expanded (int):       amount of macro calls
+        warnings (int):             amount of warnings
+        cache_hits (int):           amount of calls whose expansion was found in the expansion cache
+        cache_misses (int):         amount of calls whose expansion was not found in the expansion cache
+        macro_costs {str: [int, float]}: amount of calls and seconds spent in the calls of each macro called
+    """
+    def __init__(self):
+        self.phases = {}
+        self.chars_scanned = 0
+        self.chars_emitted = 0
+        self.macros_defined = 0
+        self.calls_expanded = 0
+        self.warnings = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.macro_costs = {}
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        """ Adds time spent in a phase
+
+        Args:
+            phase (str):        name of the phase, e.g. one of the PHASE_ constants
+            seconds (float):    the time spent
+        """
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def record_definition(self, seconds: float) -> None:
+        """ Records a macro definition
+
+        Args:
+            seconds (float):    time spent on the definition
+        """
+        self.macros_defined = self.macros_defined + 1
+        self.add_time(PHASE_DEFINITIONS, seconds)
+
+    def record_call(self, name: str, call_seconds: float, substitution_seconds: float) -> None:
+        """ Records a macro call
+
+        Args:
+            name (str):                     name of the called macro
+            call_seconds (float):           time spent parsing the call
+            substitution_seconds (float):   time spent substituting the arguments
+        """
+        self.calls_expanded = self.calls_expanded + 1
+        self.add_time(PHASE_CALLS, call_seconds)
+        self.add_time(PHASE_SUBSTITUTION, substitution_seconds)
+        cost = self.macro_costs.get(name)
+        if cost is None:
+            self.macro_costs[name] = [1, call_seconds + substitution_seconds]
+        else:
+            cost[0] = cost[0] + 1
+            cost[1] = cost[1] + call_seconds + substitution_seconds
+
+    def get_phases(self) -> {str: float}:
+        """ Gets the seconds spent in each phase, including the text phase left out of the other phases of the run.
+        The phases of the run come first.
+        """
+        phases = {phase: self.phases[phase] for phase in RUN_PHASES if phase in self.phases}
+        if PHASE_TOTAL in phases:
+            timed = sum(phases.values()) - phases[PHASE_TOTAL]
+            phases[PHASE_TEXT] = max(0.0, phases[PHASE_TOTAL] - timed)
+        phases.update((phase, seconds) for (phase, seconds) in self.phases.items() if phase not in RUN_PHASES)
+        return phases
+
+    def get_costly_macros(self, count: int) -> [(str, int, float)]:
+        """ Gets the macros whose calls took the most time
+
+        Args:
+            count (int):        maximal amount of macros to return
+
+        Returns:
+            list of triples (str, int, float) of macro names, amounts of calls and seconds, costliest first.
+        """
+        costs = [(name, cost[0], cost[1]) for (name, cost) in self.macro_costs.items()]
+        return sorted(costs, key=lambda item: item[2], reverse=True)[:count]
+
+    def as_dict(self, top_count: int = 10) -> dict:
+        """ Gets the statistics as a dictionary of plain values, e.g. to be written as JSON
+
+        Args:
+            top_count (int):    amount of the costliest macros included
+        """
+        return {
+            "phases": self.get_phases(),
+            "chars_scanned": self.chars_scanned,
+            "chars_emitted": self.chars_emitted,
+            "macros_defined": self.macros_defined,
+            "calls_expanded": self.calls_expanded,
+            "warnings": self.warnings,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "costly_macros": [{"name": name, "calls": calls, "seconds": seconds}
+                                for (name, calls, seconds) in self.get_costly_macros(top_count)],
+        }
+
+    def format(self, top_count: int = 10) -> [str]:
+        """ Gets the statistics as lines of a human readable report
+
+        Args:
+            top_count (int):    amount of the costliest macros included
+        """
+        lines = ["Phases:"]
+        for (phase, seconds) in self.get_phases().items():
+            lines.append("  %-14s %10.6f s" % (phase, seconds))
+        lines.append("Counters:")
+        lines.append("  %-14s %10d" % ("scanned", self.chars_scanned))
+        lines.append("  %-14s %10d" % ("emitted", self.chars_emitted))
+        lines.append("  %-14s %10d" % ("defined", self.macros_defined))
+        lines.append("  %-14s %10d" % ("expanded", self.calls_expanded))
+        lines.append("  %-14s %10d" % ("warnings", self.warnings))
+        if self.cache_hits + self.cache_misses > 0:
+            lines.append("  %-14s %10d" % ("cache hits", self.cache_hits))
+            lines.append("  %-14s %10d" % ("cache misses", self.cache_misses))
+        costly = self.get_costly_macros(top_count)
+        if len(costly) > 0:
+            lines.append("Costliest macros:")
+            for (name, calls, seconds) in costly:
+                lines.append("  %-14s %10d calls %10.6f s" % (name, calls, seconds))
+        return lines
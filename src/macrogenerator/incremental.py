@@ -0,0 +1,247 @@
+"""Module macrogenerator.incremental
+
+This module transforms successive versions of a text, e.g. a file being edited,
+re-expanding only the parts which changed since the previous version.
+
+Every version is split into top level pieces: runs of text, escapes, definitions and calls,
+each remembered with its span in the source and in the output. After an edit, the pieces before it
+are kept as they were. The text from the edit on is transformed again until it reaches a piece
+boundary of the previous version past the edit. The pieces from there on have the same text,
+so they are reused with shifted lines, except for the definitions of a macro defined earlier
+and the calls of a macro whose definition changed, which are transformed again.
+The result is always the one of transforming the whole text.
+"""
+
+from .expansioncontext import ExpansionContext
+from .macrogenerator import MacroGenerator, Span
+from .macrolibrary import MacroLibrary, MacroLibException
+from .outputbuilder import OutputBuilder
+from .tokenizer import TOKEN_DEF_START, TOKEN_CALL_START
+from error.logrecord import LogRecord
+from symbol.symbolset import DEFAULT_SYMBOLS, SymbolSet
+
+COMPARE_BLOCK = 4096
+
+def common_prefix_length(first: str, second: str) -> int:
+    """ Gets the length of the longest common prefix of two strings, comparing them in blocks
+    """
+    limit = min(len(first), len(second))
+    pos = 0
+    while pos < limit:
+        end = min(limit, pos + COMPARE_BLOCK)
+        if first[pos:end] != second[pos:end]:
+            break
+        pos = end
+    while pos < limit and first[pos] == second[pos]:
+        pos = pos + 1
+    return pos
+
+def common_suffix_length(first: str, second: str, limit: int) -> int:
+    """ Gets the length of the longest common suffix of two strings, comparing them in blocks
+
+    Args:
+        first (str):        the first string
+        second (str):       the second string
+        limit (int):        maximal length of the suffix
+    """
+    first_end = len(first)
+    second_end = len(second)
+    length = 0
+    while length < limit:
+        block = min(limit - length, COMPARE_BLOCK)
+        if first[first_end - length - block:first_end - length] != second[second_end - length - block:second_end - length]:
+            break
+        length = length + block
+    while length < limit and first[first_end - length - 1] == second[second_end - length - 1]:
+        length = length + 1
+    return length
+
+class IncrementalGenerator():
+    """ Class transforming successive versions of a text, reusing the result of the previous version
+
+    When a version fails with an error, the next one is transformed from scratch.
+
+    Attributes:
+        prelude (MacroLibrary):         frozen library of macros available to every version, None if there is none
+        report_prelude_unused (bool):   whether w12 is reported for the macros of the prelude
+        symbols (SymbolSet):            the special symbols of the syntax
+        generator (MacroGenerator):     the generator transforming the versions
+        context (ExpansionContext):     the state of the run of the last version, None if there is none
+        source_text (str):              the last version transformed successfully, None if there is none
+        output_text (str):              the result of the last version
+        spans ([Span]):                 the top level pieces of the last version, in order
+        reused (int):                   amount of pieces of the last version reused from the previous one
+    """
+    def __init__(self, prelude: MacroLibrary = None, report_prelude_unused: bool = False,
+                    symbols: SymbolSet = DEFAULT_SYMBOLS):
+        """
+        Args:
+            prelude (MacroLibrary):         library of macros available to every version, e.g. from load_prelude
+            report_prelude_unused (bool):   whether w12 is reported for the macros of the prelude
+            symbols (SymbolSet):            the special symbols of the syntax
+        """
+        self.prelude = prelude
+        self.report_prelude_unused = report_prelude_unused
+        self.symbols = symbols
+        self.generator = MacroGenerator(prelude, report_prelude_unused, symbols=symbols)
+        self.reset()
+
+    def reset(self) -> None:
+        """ Forgets the previous version, so that the next one is transformed from scratch
+        """
+        self.context = None
+        self.source_text = None
+        self.output_text = None
+        self.spans = None
+        self.reused = 0
+
+    def transform(self, source_text: str) -> (str, [LogRecord]):
+        """ Transforms the next version of the text
+
+        Can throw a Log object when an error occurs.
+
+        Args:
+            source_text (str):  the text to be transformed
+
+        Returns:
+            a pair (str, [LogRecord]), where the string is the resulting transforming text,
+            and the list of Logs are warnings encountered during execution.
+        """
+        context = self.generator.new_context()
+        try:
+            (output_text, spans) = self.__update(context, source_text)
+        except BaseException:
+            self.reset()
+            raise
+
+        self.context = context
+        self.source_text = source_text
+        self.output_text = output_text
+        self.spans = spans
+
+        logs = [log for span in spans for log in span.logs]
+        logs.extend(self.generator.unused_macros(context))
+        return output_text, logs
+
+    def __update(self, context: ExpansionContext, source_text: str) -> (str, [Span]):
+        """ Function transforming the text, reusing the pieces of the previous version
+
+        Can throw a Log object when an error occurs.
+
+        Returns:
+            a pair (str, [Span]) of the resulting text and the pieces of the text.
+        """
+        old_text = "" if self.source_text is None else self.source_text
+        old_output = "" if self.output_text is None else self.output_text
+        old_spans = [] if self.spans is None else self.spans
+        prefix = common_prefix_length(old_text, source_text)
+        suffix = common_suffix_length(old_text, source_text, min(len(old_text), len(source_text)) - prefix)
+        suffix_start = len(source_text) - suffix
+        shift = len(source_text) - len(old_text)
+        self.reused = 0
+
+        # Pieces before the edit see the same text and the same macros.
+        # The one touching the edit may extend differently, e.g. a run of text.
+        kept = 0
+        while kept < len(old_spans) and old_spans[kept].end < prefix:
+            self.__replay(context, old_spans[kept])
+            kept = kept + 1
+        spans = old_spans[:kept]
+        output = OutputBuilder()
+        pos = 0
+        out_pos = 0
+        if kept > 0:
+            pos = spans[-1].end
+            out_pos = spans[-1].out_end
+            context.line = spans[-1].end_line
+            output.append(old_output[:out_pos])
+        self.reused = kept
+
+        # Transform from the edit until a piece boundary of the previous version in the unchanged suffix
+        index = kept
+        pieces = self.generator.spans(context, source_text, pos)
+        while True:
+            if pos >= suffix_start:
+                while index < len(old_spans) and old_spans[index].start + shift < pos:
+                    index = index + 1
+                if index < len(old_spans) and old_spans[index].start + shift == pos:
+                    break
+            piece = next(pieces, None)
+            if piece is None:
+                return output.build(), spans
+            (span, text) = piece
+            out_pos = self.__place(span, text, out_pos, output)
+            spans.append(span)
+            pos = span.end
+
+        # Reuse the pieces of the unchanged suffix
+        line_shift = context.line - old_spans[index].line
+        run_start = None
+        run_end = None
+        for span in old_spans[index:]:
+            if self.__reusable(context, span):
+                if run_start is None:
+                    run_start = span.out_start
+                run_end = span.out_end
+                span.start = span.start + shift
+                span.end = span.end + shift
+                span.line = span.line + line_shift
+                span.end_line = span.end_line + line_shift
+                if line_shift != 0:
+                    span.logs = [LogRecord(log.err_code, log.line + line_shift, log.args) for log in span.logs]
+                length = span.out_end - span.out_start
+                span.out_start = out_pos
+                out_pos = out_pos + length
+                span.out_end = out_pos
+                self.__replay(context, span)
+                spans.append(span)
+                self.reused = self.reused + 1
+            else:
+                if run_start is not None:
+                    output.append(old_output[run_start:run_end])
+                    run_start = None
+                context.line = span.line + line_shift
+                (new_span, text) = next(self.generator.spans(context, source_text, span.start + shift))
+                out_pos = self.__place(new_span, text, out_pos, output)
+                spans.append(new_span)
+        if run_start is not None:
+            output.append(old_output[run_start:run_end])
+        return output.build(), spans
+
+    def __place(self, span: Span, text: str, out_pos: int, output: OutputBuilder) -> int:
+        """ Function appending the resulting text of a transformed piece to the output
+
+        Returns:
+            int:    index in the output right after the text.
+        """
+        output.append(text)
+        span.out_start = out_pos
+        span.out_end = out_pos + len(text)
+        return span.out_end
+
+    def __replay(self, context: ExpansionContext, span: Span) -> None:
+        """ Function applying the effect of a reused definition or call to the run
+        """
+        if span.kind == TOKEN_DEF_START:
+            context.macro_library.insert_macro(span.macro)
+        elif span.kind == TOKEN_CALL_START:
+            context.call_counts[span.macro.name] = context.call_counts.get(span.macro.name, 0) + 1
+
+    def __reusable(self, context: ExpansionContext, span: Span) -> bool:
+        """ Function checking whether a piece of the unchanged suffix has the same result as before
+
+        A definition is reusable if its macro is not defined yet, a call if its macro has the same definition.
+        The call then refers to the current macro from now on.
+        """
+        if span.kind == TOKEN_DEF_START:
+            return span.macro.name not in context.macro_library
+        if span.kind == TOKEN_CALL_START:
+            try:
+                macro = context.macro_library.get_macro(span.macro.name)
+            except MacroLibException:
+                return False
+            if macro is not span.macro:
+                if macro.arguments != span.macro.arguments or macro.body != span.macro.body:
+                    return False
+                span.macro = macro
+        return True
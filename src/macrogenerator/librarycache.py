@@ -0,0 +1,202 @@
+"""Module macrogenerator.librarycache
+
+This module stores compiled macro libraries on disk, so that a prelude is parsed only once.
+
+Entries are keyed by a hash of the prelude text, its special symbols, the cache version and the format
+of the stored data, which marshal only keeps stable within a Python version. Each file holds
+a checksum of its content, so corrupted entries are detected, removed and treated as missing.
+When the cache grows beyond its size limit, the least recently used entries are evicted.
+"""
+
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import zlib
+
+from .macro import Macro
+from .macrolibrary import MacroLibrary
+from .macrogenerator import load_prelude
+from error.logrecord import LogRecord
+from symbol.symbolset import DEFAULT_SYMBOLS, SymbolSet
+
+# bumped whenever the format of the entries or the meaning of the stored data changes
+CACHE_VERSION = "1"
+# entries are stored with marshal, whose format may change between Python versions
+CACHE_FORMAT = "%s;python %d.%d;marshal %d" % (CACHE_VERSION, sys.version_info[0], sys.version_info[1], marshal.version)
+CACHE_MAGIC = b"MGLC"
+CACHE_SUFFIX = ".mglc"
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+def default_cache_dir() -> str:
+    """ Gets the default directory of the cache, following the XDG base directory specification
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "macrogenerator")
+
+class LibraryCache():
+    """ Class storing compiled prelude libraries on disk
+
+    Failing to read or write the cache never fails the caller, the prelude is parsed instead.
+
+    Attributes:
+        directory (str):    directory with the cache entries
+        max_size (int):     maximal total size of the entries in bytes
+    """
+    def __init__(self, directory: str = None, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Args:
+            directory (str):    directory with the cache entries, default_cache_dir() if None
+            max_size (int):     maximal total size of the entries in bytes
+        """
+        self.directory = default_cache_dir() if directory is None else directory
+        self.max_size = max_size
+
+    def key(self, source_text: str, symbols: SymbolSet = DEFAULT_SYMBOLS) -> str:
+        """ Gets the key of the entry of a prelude
+
+        Args:
+            source_text (str):  the text of the prelude
+            symbols (SymbolSet):    the special symbols the prelude is written with
+        """
+        digest = hashlib.sha256()
+        digest.update(CACHE_FORMAT.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(symbols.as_string().encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(source_text.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def load_prelude(self, source_text: str, symbols: SymbolSet = DEFAULT_SYMBOLS) -> (MacroLibrary, [LogRecord]):
+        """ Loads a prelude from the cache, or parses it with load_prelude and stores it on a miss
+
+        Can throw a Log object when an error occurs in the prelude.
+
+        Args:
+            source_text (str):  the text of the prelude
+            symbols (SymbolSet):    the special symbols the prelude is written with
+
+        Returns:
+            a pair (MacroLibrary, [LogRecord]) of the frozen library and the warnings encountered in the prelude.
+        """
+        entry = self.load(source_text, symbols)
+        if entry is not None:
+            return entry
+        (library, logs) = load_prelude(source_text, symbols)
+        self.store(source_text, library, logs, symbols)
+        return library, logs
+
+    def load(self, source_text: str, symbols: SymbolSet = DEFAULT_SYMBOLS) -> (MacroLibrary, [LogRecord]):
+        """ Loads a prelude from the cache
+
+        Args:
+            source_text (str):  the text of the prelude
+            symbols (SymbolSet):    the special symbols the prelude is written with
+
+        Returns:
+            a pair (MacroLibrary, [LogRecord]) of the frozen library and the warnings encountered in the prelude,
+            None if there is no valid entry.
+        """
+        key = self.key(source_text, symbols)
+        path = self.__path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+
+        try:
+            (stored_key, macros, logs) = self.__decode(data)
+            if stored_key != key:
+                raise ValueError("Cache entry stored under a wrong key")
+            library = MacroLibrary()
+            for (name, arguments, body, literals, slots) in macros:
+                library.insert_macro(Macro(sys.intern(name), [sys.intern(argument) for argument in arguments], body,
+                                                (literals, slots)))
+            logs = [LogRecord(code, line, args) for (code, line, args) in logs]
+        except Exception:
+            # corrupted or incompatible entry
+            self.__remove(path)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return library.freeze(), logs
+
+    def store(self, source_text: str, library: MacroLibrary, logs: [LogRecord], symbols: SymbolSet = DEFAULT_SYMBOLS) -> None:
+        """ Stores a prelude in the cache, then evicts the least recently used entries above the size limit
+
+        Args:
+            source_text (str):  the text of the prelude
+            library (MacroLibrary): the library of the prelude
+            logs ([LogRecord]): the warnings encountered in the prelude
+            symbols (SymbolSet):    the special symbols the prelude is written with
+        """
+        key = self.key(source_text, symbols)
+        macros = [(m.name, tuple(m.arguments), m.body, m.literals, m.slots) for m in library.library]
+        stored_logs = [(log.err_code, log.line, tuple(log.args)) for log in logs]
+        data = self.__encode((key, macros, stored_logs))
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            (handle, temp_path) = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(handle, 'wb') as file:
+                    file.write(data)
+                os.replace(temp_path, self.__path(key))
+            except OSError:
+                self.__remove(temp_path)
+                return
+        except OSError:
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """ Removes the least recently used entries until the cache fits in its size limit
+        """
+        entries = []
+        try:
+            for name in os.listdir(self.directory):
+                if name.endswith(CACHE_SUFFIX):
+                    path = os.path.join(self.directory, name)
+                    status = os.stat(path)
+                    entries.append((status.st_mtime, status.st_size, path))
+        except OSError:
+            return
+
+        total = sum(size for (mtime, size, path) in entries)
+        for (mtime, size, path) in sorted(entries):
+            if total <= self.max_size:
+                break
+            self.__remove(path)
+            total = total - size
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def __remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def __encode(self, entry: tuple) -> bytes:
+        """ Serializes an entry as the magic number, the checksum of the content and the compressed content
+        """
+        content = zlib.compress(marshal.dumps(entry))
+        return CACHE_MAGIC + hashlib.sha256(content).digest() + content
+
+    def __decode(self, data: bytes) -> tuple:
+        """ Deserializes an entry
+
+        Can throw ValueError if the entry is corrupted
+        """
+        header = len(CACHE_MAGIC)
+        checksum = data[header:header + 32]
+        content = data[header + 32:]
+        if data[:header] != CACHE_MAGIC or hashlib.sha256(content).digest() != checksum:
+            raise ValueError("Corrupted cache entry")
+        return marshal.loads(zlib.decompress(content))
@@ -1,13 +1,96 @@
+from symbol.symbolset import DEFAULT_SYMBOLS, SymbolSet
+
 class Macro():
     """ Class describing a macro
+
+    The body is compiled once, when the macro is created, into literal segments
+    with escapes already resolved and the argument slots between them.
+
+    Attributes:
+        literals (str,):    literal segments of the body, one more than there are slots
+        slots (int,):       indices in arguments of the arguments substituted between the literals
     """
-    def __init__(self, name: str, arguments: [str], body: str):
+    # libraries may hold many thousands of macros, so they have no per-instance dict
+    __slots__ = ("name", "arguments", "body", "literals", "slots")
+
+    def __init__(self, name: str, arguments: [str], body: str, template: ((str,), (int,)) = None,
+                    symbols: SymbolSet = DEFAULT_SYMBOLS):
         """
         Args:
             name (str):         name of the macro
             arguments ([str]):  argument names in the macro
             body (str):         macro body
+            template (((str,), (int,))): literals and slots of the already compiled body, e.g. loaded from a cache,
+                                the body is compiled if None
+            symbols (SymbolSet):    the special symbols the body is written with
         """
         self.name = name
         self.arguments = arguments
-        self.body = body
\ No newline at end of file
+        self.body = body
+        if template is None:
+            template = self.__compile(symbols)
+        (self.literals, self.slots) = template
+
+    def __compile(self, symbols: SymbolSet) -> ((str,), (int,)):
+        """ Splits the body into literal segments and argument slots
+
+        Can throw ValueError if the body references an undefined argument
+
+        Args:
+            symbols (SymbolSet):    the special symbols the body is written with
+
+        Returns:
+            ((str,), (int,)):   the literal segments and the argument slot indices
+        """
+        body = self.body
+        escape = symbols.escape
+        argument = symbols.argument
+        length = len(body)
+        literals = []
+        slots = []
+        literal = []
+        # the slot of every argument name, resolved once instead of searching the list at every reference
+        positions = {}
+        for (index, name) in enumerate(self.arguments):
+            positions.setdefault(name, index)
+        pos = 0
+        span_start = 0
+        while pos < length:
+            char = body[pos]
+            pos = pos + 1
+            if char == escape:
+                literal.append(body[span_start:pos - 1])
+                literal.append(body[pos:pos + 1])
+                pos = pos + 1
+                span_start = pos
+                continue
+            if char == argument:
+                literal.append(body[span_start:pos - 1])
+                arg_end = body.find(argument, pos)
+                if arg_end == -1:
+                    pos = length
+                else:
+                    literals.append("".join(literal))
+                    slot = positions.get(body[pos:arg_end])
+                    if slot is None:
+                        raise ValueError("Argument not defined in macro")
+                    slots.append(slot)
+                    literal = []
+                    pos = arg_end + 1
+                span_start = pos
+        literal.append(body[span_start:pos])
+        literals.append("".join(literal))
+        return tuple(literals), tuple(slots)
+
+    def expand(self, args: [str]) -> str:
+        """ Substitutes the arguments into the compiled body
+
+        Args:
+            args ([str]):       values of the arguments, in order of definition
+        """
+        if len(self.slots) == 0:
+            return self.literals[0]
+        parts = [None] * (2 * len(self.slots) + 1)
+        parts[0::2] = self.literals
+        parts[1::2] = [args[slot] for slot in self.slots]
+        return "".join(parts)
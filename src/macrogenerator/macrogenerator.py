@@ -1,19 +1,136 @@
 """ Main Macro Generator class
 """
 
+import io
+import mmap
+import sys
+import threading
+import time
+
+from .expansioncache import ExpansionCache
+from .expansioncontext import ExpansionContext
+from .expansionstats import *
 from .macro import Macro
 from .macrolibrary import MacroLibrary, MacroLibException
+from .outputbuilder import OutputBuilder
+from .outputsink import DEFAULT_FLUSH_SIZE, OutputSink, SinkOutputBuilder
+from .tokenizer import *
 from error.errorlibrary import get_error_lib
 from error.log import Log
-from symbol.symbol import *
+from error.logrecord import LogRecord
+from symbol.symbolset import DEFAULT_SYMBOLS, SymbolSet
+
+MAPPED_ENCODING = "utf-8"
+NEWLINE_BLOCK = 1024 * 1024
+
+class IncompleteInput(Exception):
+    """Exception signalling that the input ended inside a construct while more input may follow.
+    Used internally by the streaming transform.
+    """
+
+class Span():
+    """ Class describing a single top level piece of the transformed text: a run of text, an escape, a definition or a call
+
+    Attributes:
+        kind (str):         TOKEN_TEXT, TOKEN_ESCAPE, TOKEN_DEF_START or TOKEN_CALL_START
+        start (int):        index of the first character of the piece in the source text
+        end (int):          index right after the last character of the piece in the source text
+        line (int):         line at which the piece starts
+        end_line (int):     line right after the piece
+        logs ([LogRecord]): warnings encountered in the piece
+        macro (Macro):      the macro defined or called, None for text and escapes
+        out_start (int):    index of the first character of the result in the output text, None if not placed yet
+        out_end (int):      index right after the last character of the result in the output text
+    """
+    # the incremental mode keeps a span for every piece of the text
+    __slots__ = ("kind", "start", "end", "line", "end_line", "logs", "macro", "out_start", "out_end")
+
+    def __init__(self, kind: str, start: int, end: int, line: int, end_line: int, logs: [LogRecord], macro: Macro):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.line = line
+        self.end_line = end_line
+        self.logs = logs
+        self.macro = macro
+        self.out_start = None
+        self.out_end = None
 
 class MacroGenerator():
-    def __init__(self):
-        self.macro_library = MacroLibrary()
-        self.used_macros = []
-        self.line = 1
+    """ Class transforming text by defining and expanding macros
+
+    The state of every run is kept in its own ExpansionContext, so one generator
+    can serve many transforms at once, e.g. from a thread pool.
+
+    Attributes:
+        prelude (MacroLibrary):         frozen library of macros available to every input, None if there is none
+        report_prelude_unused (bool):   whether w12 is reported for the macros of the prelude
+        collect_stats (bool):           whether every run collects ExpansionStats
+        symbols (SymbolSet):            the special symbols of the syntax
+        max_warnings (int):             amount of warnings kept by every run, None for no limit
+        cache (ExpansionCache):         expansions of calls shared by all runs, None if they are not cached
+    """
+    def __init__(self, prelude: MacroLibrary = None, report_prelude_unused: bool = False, collect_stats: bool = False,
+                    symbols: SymbolSet = DEFAULT_SYMBOLS, max_warnings: int = None, cache_size: int = None):
+        """
+        Args:
+            prelude (MacroLibrary):         library of macros available to every input, e.g. from load_prelude.
+                                            It is frozen and shared, not copied.
+            report_prelude_unused (bool):   whether w12 is reported for the macros of the prelude
+            collect_stats (bool):           whether every run collects ExpansionStats, see get_stats
+            symbols (SymbolSet):            the special symbols of the syntax, see symbol.symbolset
+            max_warnings (int):             amount of warnings kept by every run, the following ones are
+                                            only counted in ExpansionContext.warnings_dropped, None for no limit
+            cache_size (int):               amount of expansions of calls cached, see expansioncache,
+                                            None for no caching
+        """
+        self.prelude = prelude
+        self.report_prelude_unused = report_prelude_unused
+        self.collect_stats = collect_stats
+        self.symbols = symbols
+        self.max_warnings = max_warnings
+        self.cache = ExpansionCache(cache_size) if cache_size is not None else None
+        if prelude is not None:
+            prelude.freeze()
+        self.__local = threading.local()
+
+    @property
+    def context(self) -> ExpansionContext:
+        """ The context of the last run started by the calling thread, None if there is none
+        """
+        return getattr(self.__local, "context", None)
 
-    def transform(self, source_text: str) -> (str, [Log]):
+    def new_context(self) -> ExpansionContext:
+        """ Creates the state of a new run, with an empty library extending the prelude
+        """
+        context = ExpansionContext(MacroLibrary() if self.prelude is None else self.prelude.extend(),
+                                    ExpansionStats() if self.collect_stats else None, self.max_warnings)
+        self.__local.context = context
+        return context
+
+    def get_call_counts(self) -> {str: int}:
+        """ Gets the number of calls of each macro defined in the last run of the calling thread,
+        including the ones never called
+        """
+        return self.context.get_call_counts()
+
+    def get_hot_macros(self, count: int) -> [(str, int)]:
+        """ Gets the most frequently called macros in the last run of the calling thread
+
+        Args:
+            count (int):        maximal amount of macros to return
+
+        Returns:
+            list of pairs (str, int) of macro names and call counts, most called first.
+        """
+        return self.context.get_hot_macros(count)
+
+    def get_stats(self) -> ExpansionStats:
+        """ Gets the timers and counters of the last run of the calling thread, None if they are not collected
+        """
+        return self.context.stats
+
+    def transform(self, source_text: str) -> (str, [LogRecord]):
         """ Main Function for transforming text
 
         Can throw a Log object when an error occurs.
@@ -22,287 +139,665 @@ class MacroGenerator():
             source_text (str): the text to be transformed
 
         Returns:
-            a pair (str, [Log]), where the string is the resulting transforming text,
+            a pair (str, [LogRecord]), where the string is the resulting transforming text,
             and the list of Logs are warnings encountered during execution.
         """
-        output_text = ""
+        context = self.new_context()
+        output = OutputBuilder()
         logs = []
-        self.line = 1
-
-        while len(source_text) != 0:
-            # get char
-            char = source_text[0]
-            source_text = source_text[1:]
-
-            # switch
-            if char == ESCAPE_CHARACTER:
-                char = source_text[0]
-                source_text = source_text[1:]
-                output_text = output_text + char
-                if not IS_SPECIAL(char):
-                    logs.append(Log("w90", self.line, char))
-                continue
-            if char == SYMBOL_DEFINITION:
-                try:
-                    (source_text) = self.__macro_definition(source_text, logs)
-                except Log as err:
-                    raise err
-                continue
-            if char == SYMBOL_CALL:
-                (source_text, macro) = self.__macro_call(source_text, logs)
-                output_text = output_text + macro
-                continue
-            if char == "\n":
-                self.line = self.line + 1
+        started = time.perf_counter()
+
+        self.__scan(context, source_text, 0, True, output, logs)
+        logs.extend(self.unused_macros(context))
+        output_text = output.build()
+
+        stats = context.stats
+        if stats is not None:
+            stats.chars_scanned = stats.chars_scanned + len(source_text)
+            stats.chars_emitted = stats.chars_emitted + len(output_text)
+            stats.warnings = stats.warnings + len(logs) + context.warnings_dropped
+            stats.add_time(PHASE_TOTAL, time.perf_counter() - started)
+        return output_text, logs
 
-            output_text = output_text + char
+    def transform_to(self, source_text: str, sink: OutputSink, flush_size: int = DEFAULT_FLUSH_SIZE) -> [LogRecord]:
+        """ Function transforming text into an output sink
 
-        for macro in self.macro_library.library:
-            if self.used_macros.count(macro.name) == 0:
-                logs.append(Log("w12", None, [macro.name]))
+        The resulting text is passed to the sink whenever flush_size characters are collected,
+        so it is never kept in memory as a whole. The sink is neither closed nor aborted.
 
-        return output_text, logs
+        Can throw a Log object when an error occurs, then the sink may have received a part of the text.
 
-    def __macro_definition(self, source_text: str, logs: [Log]) -> str:
-        """ Function handling Macro Definitions
+        Args:
+            source_text (str):  the text to be transformed
+            sink (OutputSink):  the sink receiving the resulting text, see outputsink
+            flush_size (int):   amount of characters collected before they are written to the sink
+
+        Returns:
+            [LogRecord]:        warnings encountered during execution.
+        """
+        context = self.new_context()
+        output = SinkOutputBuilder(sink, flush_size)
+        logs = []
+        started = time.perf_counter()
+
+        self.__scan(context, source_text, 0, True, output, logs)
+        logs.extend(self.unused_macros(context))
+        output.build()
+
+        stats = context.stats
+        if stats is not None:
+            stats.chars_scanned = stats.chars_scanned + len(source_text)
+            stats.chars_emitted = stats.chars_emitted + output.written
+            stats.warnings = stats.warnings + len(logs) + context.warnings_dropped
+            stats.add_time(PHASE_IO, output.write_seconds)
+            stats.add_time(PHASE_TOTAL, time.perf_counter() - started)
+        return logs
+
+    def define(self, source_text: str, context: ExpansionContext = None) -> [LogRecord]:
+        """ Function processing text only for its macro definitions
+
+        The text is transformed as usual, but the resulting text is discarded
+        and unused macros are not reported.
+
+        Can throw a Log object when an error occurs.
+
+        Args:
+            source_text (str): the text with the definitions
+            context (ExpansionContext): the run receiving the definitions, a new one if None
+
+        Returns:
+            [LogRecord]:        warnings encountered during execution.
+        """
+        if context is None:
+            context = self.new_context()
+        logs = []
+        context.line = 1
+
+        self.__scan(context, source_text, 0, True, OutputBuilder(), logs)
+
+        return logs
+
+    def transform_stream(self, reader, writer, chunk_size: int = 65536) -> [LogRecord]:
+        """ Function transforming text read from a file-like object in chunks
+
+        The expanded text is written to the writer as soon as each chunk is processed.
+        Definitions and calls spanning chunk boundaries are kept in memory until they are complete,
+        so the memory used is bounded by the largest definition or call rather than the input size.
+
+        Can throw a Log object when an error occurs.
+
+        Args:
+            reader:             file-like object with a read(size) method returning str, the text to be transformed
+            writer:             file-like object with a write(str) method, receiving the resulting text
+            chunk_size (int):   amount of characters to read at once
+
+        Returns:
+            [LogRecord]:        warnings encountered during execution.
+        """
+        context = self.new_context()
+        stats = context.stats
+        logs = []
+        buffer = ""
+        read_size = chunk_size
+        final = False
+        started = time.perf_counter()
+
+        while not final:
+            read_started = time.perf_counter()
+            chunk = reader.read(read_size)
+            read_ended = time.perf_counter()
+            final = chunk == ""
+            buffer = buffer + chunk
+            output = OutputBuilder()
+            pos = self.__scan(context, buffer, 0, final, output, logs)
+            output_text = output.build()
+            write_started = time.perf_counter()
+            writer.write(output_text)
+            if stats is not None:
+                stats.add_time(PHASE_IO, read_ended - read_started + time.perf_counter() - write_started)
+                stats.chars_scanned = stats.chars_scanned + len(chunk)
+                stats.chars_emitted = stats.chars_emitted + len(output_text)
+            buffer = buffer[pos:]
+            # an unfinished construct is re-scanned once more input arrives,
+            # reading at least its size again keeps that linear in its length
+            read_size = max(chunk_size, len(buffer))
+        logs.extend(self.unused_macros(context))
+
+        if stats is not None:
+            stats.warnings = stats.warnings + len(logs) + context.warnings_dropped
+            stats.add_time(PHASE_TOTAL, time.perf_counter() - started)
+        return logs
+
+    def transform_mapped(self, reader, writer, window_size: int = 256) -> [LogRecord]:
+        """ Function transforming a file mapped into memory
+
+        The bytes of the mapped file are scanned directly. Text between special symbols is written
+        to the writer straight from the mapping, only escapes, definitions and calls are decoded.
+        Inputs which cannot be mapped, e.g. pipes or empty files, are transformed with transform_stream.
+        So are inputs with carriage returns: newlines are translated like when the input is read as text,
+        so the result is the same as for transform of the text read from the file.
+
+        Can throw a Log object when an error occurs.
+
+        Args:
+            reader:             binary file object of the UTF-8 encoded text to be transformed
+            writer:             binary file-like object receiving the resulting UTF-8 encoded text
+            window_size (int):  amount of bytes decoded at first for a single definition or call,
+                                doubled until the whole definition or call fits
+
+        Returns:
+            [LogRecord]:        warnings encountered during execution.
+        """
+        try:
+            mapped = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            mapped = None
+        if mapped is not None and mapped.find(b"\r") != -1:
+            # the mapping is written out as it is, which would keep the carriage returns
+            mapped.close()
+            mapped = None
+        if mapped is None:
+            text_reader = io.TextIOWrapper(reader, encoding=MAPPED_ENCODING)
+            text_writer = io.TextIOWrapper(writer, encoding=MAPPED_ENCODING, newline="")
+            try:
+                return self.transform_stream(text_reader, text_writer)
+            finally:
+                text_writer.flush()
+                text_writer.detach()
+                text_reader.detach()
+
+        try:
+            with memoryview(mapped) as view:
+                return self.__scan_mapped(self.new_context(), mapped, view, writer, window_size)
+        finally:
+            mapped.close()
+
+    def spans(self, context: ExpansionContext, source_text: str, pos: int = 0):
+        """ Generator transforming the text starting at a given position one top level piece at a time
+
+        Each piece is processed only when the next one is requested, so the caller may stop at any piece
+        boundary and continue elsewhere. Unused macros are not reported.
+
+        Can throw a Log object when an error occurs.
+
+        Args:
+            context (ExpansionContext): the state of the run
+            source_text (str):  the text to be transformed
+            pos (int):          index in source_text to start at, the start of a piece at line context.line
+
+        Yields:
+            (Span, str):        the piece and its resulting text.
+        """
+        tokenizer = Tokenizer(source_text, pos, context.line, True, self.symbols)
+        tokens = tokenizer.tokens()
+
+        for token in tokens:
+            if token.kind == TOKEN_END:
+                context.line = token.line
+                return
+            logs = []
+            macro = None
+            if token.kind == TOKEN_TEXT:
+                text = token.value
+            else:
+                output = OutputBuilder()
+                self.__construct(context, source_text, tokens, token, True, output, logs)
+                text = output.build()
+                if token.kind != TOKEN_ESCAPE:
+                    macro = context.last_macro
+            context.line = tokenizer.line
+            yield Span(token.kind, token.start, tokenizer.pos, token.line, tokenizer.line, logs, macro), text
+
+    def __scan_mapped(self, context: ExpansionContext, mapped: mmap.mmap, view: memoryview, writer, window_size: int) -> [LogRecord]:
+        """ Function transforming the whole mapped file
+
+        Can throw a Log object when an error occurs.
+
+        Args:
+            context (ExpansionContext): the state of the run
+            mapped (mmap):      the mapped file
+            view (memoryview):  view of the mapped file, used to write text without copying it
+            writer:             binary file-like object receiving the resulting text
+            window_size (int):  amount of bytes decoded at first for a single definition or call
+
+        Returns:
+            [LogRecord]:        warnings encountered during execution.
+        """
+        stats = context.stats
+        logs = []
+        size = len(mapped)
+        pos = 0
+        started = time.perf_counter()
+
+        while pos < size:
+            special = self.symbols.mapped_text_stop.search(mapped, pos)
+            end = size if special is None else special.start()
+            if end > pos:
+                writer.write(view[pos:end])
+                context.line = context.line + self.__count_newlines(mapped, pos, end)
+                if stats is not None:
+                    stats.chars_emitted = stats.chars_emitted + end - pos
+            if special is None:
+                break
+            pos = end + self.__mapped_construct(context, mapped, end, writer, window_size, logs)
+        logs.extend(self.unused_macros(context))
+
+        if stats is not None:
+            stats.chars_scanned = stats.chars_scanned + size
+            stats.warnings = stats.warnings + len(logs) + context.warnings_dropped
+            stats.add_time(PHASE_TOTAL, time.perf_counter() - started)
+        return logs
+
+    def __mapped_construct(self, context: ExpansionContext, mapped: mmap.mmap, pos: int, writer, window_size: int, logs: [LogRecord]) -> int:
+        """ Function decoding and handling the escape, definition or call starting at a given byte
+
+        Can throw a Log object when an error occurs.
+
+        Args:
+            context (ExpansionContext): the state of the run
+            mapped (mmap):      the mapped file
+            pos (int):          index of the byte of the special symbol starting the construct
+            writer:             binary file-like object receiving the resulting text
+            window_size (int):  amount of bytes decoded at first
+            logs ([LogRecord]): list of logs of warnings, to which additional are appended if encountered
+
+        Returns:
+            int:    amount of bytes taken by the construct.
+        """
+        size = len(mapped)
+        while True:
+            end = min(size, pos + window_size)
+            # do not cut a multi-byte character in half
+            while end < size and mapped[end] & 0xC0 == 0x80:
+                end = end - 1
+            final = end >= size
+            source_text = mapped[pos:end].decode(MAPPED_ENCODING)
+            tokenizer = Tokenizer(source_text, 0, context.line, final, self.symbols)
+            tokens = tokenizer.tokens()
+            token = next(tokens)
+            output = OutputBuilder()
+            if token.kind != TOKEN_END and self.__construct(context, source_text, tokens, token, final, output, logs):
+                data = output.build().encode(MAPPED_ENCODING)
+                writer.write(data)
+                if context.stats is not None:
+                    context.stats.chars_emitted = context.stats.chars_emitted + len(data)
+                return len(source_text[:tokenizer.pos].encode(MAPPED_ENCODING))
+            window_size = window_size * 2
+
+    def __count_newlines(self, mapped: mmap.mmap, start: int, end: int) -> int:
+        """ Function counting newlines between two bytes of the mapped file, in blocks of bounded size
+
+        Args:
+            mapped (mmap):      the mapped file
+            start (int):        index of the first byte
+            end (int):          index right after the last byte
+        """
+        count = 0
+        while start < end:
+            block_end = min(end, start + NEWLINE_BLOCK)
+            count = count + mapped[start:block_end].count(b"\n")
+            start = block_end
+        return count
+
+    def __scan(self, context: ExpansionContext, source_text: str, pos: int, final: bool, output: OutputBuilder, logs: [LogRecord]) -> int:
+        """ Function transforming the text starting at a given position
 
         Can throw a Log object when an error occurs.
 
         Args:
+            context (ExpansionContext): the state of the run
             source_text (str):  the text to be transformed
-            logs ([Log]):       list of logs of warnings, to which additional are appended if encountered
+            pos (int):          index in source_text to start at
+            final (bool):       whether source_text contains the end of the input
+            output (OutputBuilder): builder to which the resulting text is appended
+            logs ([LogRecord]): list of logs of warnings, to which additional are appended if encountered
+
+        Returns:
+            int:    index in source_text at which the scan stopped. It is the length of source_text,
+                    unless the text ends inside an escape, definition or call and more input may follow.
+        """
+        tokens = Tokenizer(source_text, pos, context.line, final, self.symbols).tokens()
+
+        for token in tokens:
+            if token.kind == TOKEN_TEXT:
+                output.append(token.value)
+            elif token.kind == TOKEN_END:
+                context.line = token.line
+                return token.start
+            elif not self.__construct(context, source_text, tokens, token, final, output, logs):
+                return token.start
+
+    def __construct(self, context: ExpansionContext, source_text: str, tokens, token: Token, final: bool, output: OutputBuilder, logs: [LogRecord]) -> bool:
+        """ Function handling an escape, definition or call starting at a given token
+
+        Can throw a Log object when an error occurs.
+
+        Args:
+            context (ExpansionContext): the state of the run
+            source_text (str):  the text to be transformed
+            tokens:             the token generator, positioned right after token
+            token (Token):      the escape, definition symbol or call symbol token
+            final (bool):       whether source_text contains the end of the input
+            output (OutputBuilder): builder to which the resulting text is appended
+            logs ([LogRecord]): list of logs of warnings, to which additional are appended if encountered
+
+        Returns:
+            bool:   False if the text ends inside the construct and more input may follow, True otherwise.
+        """
+        if token.kind == TOKEN_ESCAPE:
+            output.append(token.value)
+            if token.value not in self.symbols.special and context.admit_warning():
+                logs.append(LogRecord("w90", token.line, (token.value,)))
+            return True
+        try:
+            if token.kind == TOKEN_DEF_START:
+                self.__macro_definition(context, source_text, tokens, token, final, logs)
+            else:
+                output.append(self.__macro_call(context, tokens, token, final, logs))
+        except IncompleteInput:
+            context.line = token.line
+            return False
+        return True
+
+    def unused_macros(self, context: ExpansionContext) -> [LogRecord]:
+        """ Function reporting a warning for every macro defined, but not called
+
+        Args:
+            context (ExpansionContext): the state of the run
 
         Returns:
-            str:    source text with the substring representing a whole macro definition removed.
+            [LogRecord]:        the warnings, in the order the macros were defined.
+        """
+        started = time.perf_counter()
+        if self.report_prelude_unused:
+            macros = context.macro_library.library
+        else:
+            macros = context.macro_library.macros.values()
+        logs = [LogRecord("w12", None, (macro.name,)) for macro in macros
+                    if macro.name not in context.call_counts and context.admit_warning()]
+        if context.stats is not None:
+            context.stats.add_time(PHASE_WARNINGS, time.perf_counter() - started)
+        return logs
+
+    def __macro_name(self, tokens, final: bool) -> (str, bool, Token):
+        """ Function extracting the name of a defined or called macro
+
+        Args:
+            tokens:             the token generator, positioned right after the definition or call symbol
+            final (bool):       whether the tokenized text contains the end of the input,
+                                IncompleteInput is thrown when it does not and the name is unfinished
+
+        Returns:
+            (str, bool, Token): the name of the macro, whether it is correct
+                                and the token following the name
         """
         name = ""
+        token = next(tokens)
+        if token.kind == TOKEN_TEXT:
+            name = token.value
+            token = next(tokens)
+        if token.kind == TOKEN_END and not final:
+            raise IncompleteInput()
+
+        name_correct = not (token.kind == TOKEN_ARG_START and name == "") and self.symbols.invalid_name.search(name) is None
+        return name, name_correct, token
+
+    def __macro_definition(self, context: ExpansionContext, source_text: str, tokens, start: Token, final: bool, logs: [LogRecord]) -> None:
+        """ Function handling Macro Definitions
+
+        Can throw a Log object when an error occurs.
+
+        Args:
+            context (ExpansionContext): the state of the run
+            source_text (str):  the text to be transformed
+            tokens:             the token generator, positioned right after the definition symbol
+            start (Token):      the definition symbol token
+            final (bool):       whether source_text contains the end of the input,
+                                IncompleteInput is thrown when it does not and the definition is unfinished
+            logs ([LogRecord]): list of logs of warnings, to which additional are appended if encountered
+        """
         args = []
-        arg = ""
-        body = ""
+        arg_names = set()
 
-        # Extract name
-        name_correct = True
-        while len(source_text) != 0:
-            char = source_text[0]
-            source_text = source_text[1:]
-            if char == SYMBOL_ARG_START:
-                if name == "":
-                    name_correct = False
-                break
-            if IS_SPECIAL(char) or char.isspace():
-                name_correct = False
-            name = name + char
+        started = time.perf_counter() if context.stats is not None else 0.0
+
+        # Extract name, interned as it is kept by the library and shared by every call and warning
+        (name, name_correct, token) = self.__macro_name(tokens, final)
         if not name_correct:
-            raise Log("e10", self.line, [name])
+            raise Log("e10", start.line, [name])
+        name = sys.intern(name)
 
         # Extract argument names
-        arg_correct = True
-        while len(source_text) != 0:
-            char = source_text[0]
-            source_text = source_text[1:]
-            if char == SYMBOL_ARG_END:
+        arg = ""
+        while token.kind != TOKEN_END:
+            token = next(tokens)
+            if token.kind == TOKEN_TEXT:
+                arg = arg + token.value
+                continue
+            if token.kind == TOKEN_ARG_END or token.kind == TOKEN_SEPARATOR:
+                arg = arg.lstrip()
+                arg_correct = not (arg == "" and token.kind == TOKEN_SEPARATOR) and self.symbols.invalid_name.search(arg) is None
                 if not arg_correct:
-                    raise Log("e12", self.line, [name, arg])
-                if args.count(arg) != 0:
-                    raise Log("e17", self.line, [name, arg])
+                    raise Log("e12", token.line, [name, arg])
+                if arg in arg_names:
+                    raise Log("e17", token.line, [name, arg])
                 if arg != "":
+                    arg = sys.intern(arg)
                     args.append(arg)
-                break
-            if char == SYMBOL_ARG_SEPARATOR:
-                if not arg_correct or arg == "":
-                    raise Log("e12", self.line, [name, arg])
-                if args.count(arg) != 0:
-                    raise Log("e17", self.line, [name, arg])
-                args.append(arg)
+                    arg_names.add(arg)
                 arg = ""
-                arg_correct = True
-                continue
-            if IS_SPECIAL(char):
-                arg_correct = False
-            if char.isspace() and arg != "":
-                arg_correct = False
-            if char == "\n":
-                self.line = self.line + 1
-            if char.isspace() and arg == "":
-                continue
-            arg = arg + char
+                if token.kind == TOKEN_ARG_END:
+                    break
 
         # Get body start
-        while len(source_text) != 0:
-            char = source_text[0]
-            source_text = source_text[1:]
-            if char == "\n":
-                self.line = self.line + 1
-            if char.isspace():
+        while token.kind != TOKEN_END:
+            token = next(tokens)
+            if token.kind == TOKEN_SPACE:
                 continue
-            if char == SYMBOL_BODY_START:
+            if token.kind == TOKEN_BODY_START:
                 break
-            raise Log("e13", self.line, [name])
-            
+            if token.kind != TOKEN_END:
+                raise Log("e13", token.line, [name])
+
         # Extract body
-        macro_full = False
-        args_used = []
-        while len(source_text) != 0:
-            char = source_text[0]
-            source_text = source_text[1:]
-            if char == ESCAPE_CHARACTER:
-                body = body + char
-                char = source_text[0]
-                source_text = source_text[1:]
-                body = body + char
-                continue
-            if char == SYMBOL_BODY_END:
-                macro_full = True
-                while len(source_text) != 0:
-                    char = source_text[0]
-                    if not char.isspace():
-                        break
-                    if char == "\n":
-                        self.line = self.line + 1
-                    source_text = source_text[1:]
+        body_start = token.end
+        args_used = set()
+        while token.kind != TOKEN_END:
+            token = next(tokens)
+            if token.kind == TOKEN_BODY_END:
                 break
-            if char == SYMBOL_DEFINITION:
-                raise Log("e16", self.line, [name])
-            if char == SYMBOL_CALL:
-                raise Log("e15", self.line, [name])
-            if char == "\n":
-                self.line = self.line + 1
-            body = body + char
-            if char == SYMBOL_ARGUMENT:
-                arg = ""
-                while len(source_text) != 0:
-                    char = source_text[0]
-                    source_text = source_text[1:]
-                    if char == SYMBOL_ARGUMENT:
-                        body = body + char
-                        break
-                    arg = arg + char
-                    body = body + char
-                args_used.append(arg)
-                if args.count(arg) == 0:
-                    raise Log("e14", self.line, [name, arg])
-
-        if len(source_text) == 0 and not macro_full:
-            raise Log("e18", self.line, [name])
-
-        if body == "":
-            logs.append(Log("w11", self.line, [name]))
+            if token.kind == TOKEN_DEF_START:
+                raise Log("e16", token.line, [name])
+            if token.kind == TOKEN_CALL_START:
+                raise Log("e15", token.line, [name])
+            if token.kind == TOKEN_ARG_REF:
+                args_used.add(token.value)
+                if token.value not in arg_names:
+                    raise Log("e14", token.line, [name, token.value])
+        body = source_text[body_start:token.start]
+
+        # Skip whitespace after the body
+        if token.kind == TOKEN_BODY_END:
+            token = next(tokens)
+        if token.kind == TOKEN_END:
+            if not final:
+                raise IncompleteInput()
+            raise Log("e18", token.line, [name])
+        context.line = token.line + token.value.count("\n")
+
+        if body == "" and context.admit_warning():
+            logs.append(LogRecord("w11", context.line, (name,)))
         for a in args:
-            if args_used.count(a) == 0:
-                logs.append(Log("w10", self.line, [name, a]))
+            if a not in args_used and context.admit_warning():
+                logs.append(LogRecord("w10", context.line, (name, a)))
 
         # Add to library
+        macro = Macro(name, args, body, symbols=self.symbols)
         try:
-            self.macro_library.insert_macro(Macro(name, args, body))
+            context.macro_library.insert_macro(macro)
         except MacroLibException:
-            raise Log("e11", self.line, [name])
+            raise Log("e11", context.line, [name])
+        context.last_macro = macro
+        if context.stats is not None:
+            context.stats.record_definition(time.perf_counter() - started)
 
-        return source_text
-
-    def __macro_call(self, source_text: str, logs: [Log]) -> (str, str):
+    def __macro_call(self, context: ExpansionContext, tokens, start: Token, final: bool, logs: [LogRecord]) -> str:
         """ Function handling Macro Calls
 
         Can throw a Log object when an error occurs.
 
         Args:
-            source_text (str):  the text to be transformed
-            logs ([Log]):       list of logs of warnings, to which additional are appended if encountered
+            context (ExpansionContext): the state of the run
+            tokens:             the token generator, positioned right after the call symbol
+            start (Token):      the call symbol token
+            final (bool):       whether the tokenized text contains the end of the input,
+                                IncompleteInput is thrown when it does not and the call is unfinished
+            logs ([LogRecord]): list of logs of warnings, to which additional are appended if encountered
 
         Returns:
-            (str, str):         first str is the source text with the macrocall substring removed
-                                the second one returns the string resulting from the macro call
+            str:                the string resulting from the macro call
         """
-        name = ""
-        arg = ""
         args = []
-        out = ""
+
+        started = time.perf_counter() if context.stats is not None else 0.0
 
         # Extract name
-        name_correct = True
-        while len(source_text) != 0:
-            char = source_text[0]
-            source_text = source_text[1:]
-            if char == SYMBOL_ARG_START:
-                if name == "":
-                    name_correct = False
-                break
-            if IS_SPECIAL(char) or char.isspace():
-                name_correct = False
-            name = name + char
+        (name, name_correct, token) = self.__macro_name(tokens, final)
         if not name_correct:
-            raise Log("e22", self.line, [name])
+            raise Log("e22", start.line, [name])
 
         # Fetch from library
         try:
-            macro = self.macro_library.get_macro(name)
+            macro = context.macro_library.get_macro(name)
         except MacroLibException:
-            raise Log("e20", self.line, [name])
-
-        self.used_macros.append(name)
+            raise Log("e20", start.line, [name])
+        # the interned name of the definition is kept instead of the copy parsed at every call
+        name = macro.name
 
         # Extract arguments
-        macro_full = False
-        while len(source_text) != 0:
-            char = source_text[0]
-            source_text = source_text[1:]
-            if char == ESCAPE_CHARACTER:
-                char = source_text[0]
-                source_text = source_text[1:]
-                arg = arg + char
+        arg = OutputBuilder()
+        while token.kind != TOKEN_END:
+            token = next(tokens)
+            if token.kind == TOKEN_TEXT or token.kind == TOKEN_ESCAPE:
+                arg.append(token.value)
                 continue
-            if char == SYMBOL_ARG_END:
-                macro_full = True
-                args.append(arg)
-                break
-            if char == SYMBOL_ARG_SEPARATOR:
-                args.append(arg)
-                arg = ""
+            if token.kind == TOKEN_ARG_END or token.kind == TOKEN_SEPARATOR:
+                args.append(arg.build())
+                if token.kind == TOKEN_ARG_END:
+                    break
+                arg = OutputBuilder()
                 continue
-            if char == SYMBOL_DEFINITION:
-                raise Log("e24", self.line, [name])
-            if char == SYMBOL_CALL:
-                raise Log("e23", self.line, [name])
-            if char == "\n":
-                self.line = self.line + 1
-            arg = arg + char
-        
-        if len(source_text) == 0 and not macro_full:
-            raise Log("e25", self.line, [name])
+            if token.kind == TOKEN_DEF_START:
+                raise Log("e24", token.line, [name])
+            if token.kind == TOKEN_CALL_START:
+                raise Log("e23", token.line, [name])
+
+        if token.kind == TOKEN_END:
+            if not final:
+                raise IncompleteInput()
+            raise Log("e25", token.line, [name])
+        context.line = token.line
+
+        context.call_counts[name] = context.call_counts.get(name, 0) + 1
+        context.last_macro = macro
 
         args_used = len(args)
         args_def = len(macro.arguments)
         if args_used < args_def:
-            raise Log("e21", self.line, [name, str(args_used), str(args_def)])
-        if not (args_def == 0 and args_used == 1 and args[0] == ""):
-            if args_used > args_def:
-                logs.append(Log("w20", self.line, [name, str(args_used), str(args_def)]))
-            for a in args:
-                if a == "":
-                    logs.append(Log("w21", self.line, [name, a]))
-                elif a[0].isspace():
-                    logs.append(Log("w22", self.line, [name, a]))
+            raise Log("e21", context.line, [name, str(args_used), str(args_def)])
+        if self.cache is not None:
+            return self.__cached_call(context, macro, tuple(args), started, logs)
+        self.__report_warnings(context, self.__call_warnings(macro, args), logs)
 
         # Substitute
-        body = macro.body
-        while len(body) != 0:
-            char = body[0]
-            body = body[1:]
-            if char == ESCAPE_CHARACTER:
-                char = body[0]
-                body = body[1:]
-                out = out + char
-                continue
-            if char == SYMBOL_ARGUMENT:
-                arg = ""
-                while len(body) != 0:
-                    char = body[0]
-                    body = body[1:]
-                    if char == SYMBOL_ARGUMENT:
-                        out = out + args[macro.arguments.index(arg)]
-                        break
-                    arg = arg + char
-                continue
-            out = out + char
+        if context.stats is None:
+            return macro.expand(args)
+        substitution_started = time.perf_counter()
+        expansion = macro.expand(args)
+        context.stats.record_call(name, substitution_started - started, time.perf_counter() - substitution_started)
+        return expansion
+
+    def __cached_call(self, context: ExpansionContext, macro: Macro, args: tuple, started: float, logs: [LogRecord]) -> str:
+        """ Function finishing a Macro Call through the expansion cache
+
+        The warnings stored with a cached expansion are reported again at the line of the call,
+        so they are the same as without the cache.
+
+        Args:
+            context (ExpansionContext): the state of the run
+            macro (Macro):      the called macro
+            args (tuple):       values of the arguments, at least as many as the macro has
+            started (float):    when the call started, only used for the statistics
+            logs ([LogRecord]): list of logs of warnings, to which the warnings of the call are appended
+
+        Returns:
+            str:                the string resulting from the macro call
+        """
+        substitution_started = time.perf_counter() if context.stats is not None else 0.0
+        entry = self.cache.get(macro, args)
+        if entry is None:
+            entry = (macro.expand(args), self.__call_warnings(macro, args))
+            self.cache.put(macro, args, entry[0], entry[1])
+            if context.stats is not None:
+                context.stats.cache_misses = context.stats.cache_misses + 1
+        elif context.stats is not None:
+            context.stats.cache_hits = context.stats.cache_hits + 1
+        (expansion, warnings) = entry
+        self.__report_warnings(context, warnings, logs)
+
+        if context.stats is not None:
+            context.stats.record_call(macro.name, substitution_started - started, time.perf_counter() - substitution_started)
+        return expansion
+
+    def __call_warnings(self, macro: Macro, args: [str]) -> tuple:
+        """ Function checking the arguments of a call for warnings w20, w21 and w22
+
+        Args:
+            macro (Macro):      the called macro
+            args ([str]):       values of the arguments, a list or a tuple
+
+        Returns:
+            tuple:              the warnings, pairs of the code and the arguments of the LogRecord
+        """
+        args_used = len(args)
+        args_def = len(macro.arguments)
+        if args_def == 0 and args_used == 1 and args[0] == "":
+            return ()
+        warnings = []
+        if args_used > args_def:
+            warnings.append(("w20", (macro.name, str(args_used), str(args_def))))
+        for a in args:
+            if a == "":
+                warnings.append(("w21", (macro.name, a)))
+            elif a[0].isspace():
+                warnings.append(("w22", (macro.name, a)))
+        return tuple(warnings)
+
+    def __report_warnings(self, context: ExpansionContext, warnings: tuple, logs: [LogRecord]) -> None:
+        """ Function reporting the warnings of a call at the current line, as far as the limit of warnings allows
 
-        # Return
-        return source_text, out
\ No newline at end of file
+        Args:
+            context (ExpansionContext): the state of the run
+            warnings (tuple):   the warnings, pairs of the code and the arguments of the LogRecord, see __call_warnings
+            logs ([LogRecord]): list of logs of warnings, to which the warnings are appended
+        """
+        for (err_code, warning_args) in warnings:
+            if context.admit_warning():
+                logs.append(LogRecord(err_code, context.line, warning_args))
+
+def load_prelude(source_text: str, symbols: SymbolSet = DEFAULT_SYMBOLS) -> (MacroLibrary, [LogRecord]):
+    """ Loads the definitions of a prelude into a frozen library, to be shared by many MacroGenerators
+
+    Can throw a Log object when an error occurs.
+
+    Args:
+        source_text (str):  the text with the definitions of the prelude
+        symbols (SymbolSet):    the special symbols the prelude is written with
+
+    Returns:
+        a pair (MacroLibrary, [LogRecord]) of the library and the warnings encountered in the prelude.
+    """
+    generator = MacroGenerator(symbols=symbols)
+    context = generator.new_context()
+    logs = generator.define(source_text, context)
+    return context.macro_library.freeze(), logs
@@ -12,9 +12,34 @@ class MacroLibException(Exception):
 
 class MacroLibrary():
     """ Class for storing macros
+
+    A library can extend a parent library, e.g. a prelude shared by many inputs. Macros of the parent
+    are visible in the library, but new macros are only added to the library itself.
+
+    Attributes:
+        macros {str: Macro}:    the macros in the library indexed by name, kept in order of definition
+        parent (MacroLibrary):  the library extended by this one, None if there is none
+        frozen (bool):          whether adding macros to the library is forbidden
     """
-    def __init__(self):
-        self.library = []
+    def __init__(self, parent: "MacroLibrary" = None):
+        """
+        Args:
+            parent (MacroLibrary):  the library to extend, it should be frozen
+        """
+        self.macros = {}
+        self.parent = parent
+        self.frozen = False
+
+    @property
+    def library(self) -> [Macro]:
+        """ List of the macros in the library in order of definition, the ones of the parent first
+        """
+        if self.parent is None:
+            return list(self.macros.values())
+        return self.parent.library + list(self.macros.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.macros or (self.parent is not None and name in self.parent)
 
     def get_macro(self, name: str) -> Macro:
         """ Gets a macro from library given a macro name
@@ -24,10 +49,11 @@ class MacroLibrary():
         Args:
             name (str):         name of the macro to get
         """
-        for m in self.library:
-            if m.name == name:
-                return m
-
+        macro = self.macros.get(name)
+        if macro is not None:
+            return macro
+        if self.parent is not None:
+            return self.parent.get_macro(name)
         raise MacroLibException("Macro not found in library")
 
     def insert_macro(self, element: Macro) -> None:
@@ -38,8 +64,24 @@ class MacroLibrary():
         Args:
             element (Macro):    Macro to add
         """
-        for m in self.library:
-            if m.name == element.name:
-                raise MacroLibException("Macro already defined")
+        if self.frozen:
+            raise MacroLibException("Library is frozen")
+        if element.name in self:
+            raise MacroLibException("Macro already defined")
+
+        self.macros[element.name] = element
+
+    def freeze(self) -> "MacroLibrary":
+        """ Forbids adding macros to the library, so that it can be shared
 
-        self.library.append(element)
\ No newline at end of file
+        Returns:
+            MacroLibrary:       the library itself
+        """
+        self.frozen = True
+        return self
+
+    def extend(self) -> "MacroLibrary":
+        """ Creates an empty library extending this one, which is frozen.
+        Takes constant time regardless of the amount of macros.
+        """
+        return MacroLibrary(self.freeze())
@@ -0,0 +1,24 @@
+class OutputBuilder():
+    """ Class accumulating output text as a list of chunks, joined only once
+
+    Attributes:
+        chunks [str]:       the chunks of text collected so far
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def append(self, text: str) -> None:
+        """ Appends a piece of text to the output
+
+        Args:
+            text (str):         text to append
+        """
+        if text:
+            self.chunks.append(text)
+
+    def build(self) -> str:
+        """ Joins the collected chunks into the resulting text
+        """
+        text = "".join(self.chunks)
+        self.chunks = [text] if text else []
+        return text
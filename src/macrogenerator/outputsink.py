@@ -0,0 +1,262 @@
+"""Module macrogenerator.outputsink
+
+This module provides the destinations the resulting text of a transform is written to.
+
+A sink receives the text in pieces while the expansion goes on, so the whole result never has to be
+kept in memory. Once the expansion succeeds the sink is closed, committing the text, if it fails
+the sink is aborted instead. Used as context managers, sinks close or abort themselves accordingly.
+
+Files are written atomically only when they are regular files, or do not exist yet: symbolic links are
+followed and the file they point to is replaced, while devices, pipes and the like are written in place.
+"""
+
+from abc import ABC, abstractmethod
+import os
+import stat
+import sys
+import tempfile
+import time
+
+from .outputbuilder import OutputBuilder
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_FLUSH_SIZE = 64 * 1024
+
+class OutputSink(ABC):
+    """ Class of a destination of the resulting text, to be extended by the actual sinks
+    """
+    def __enter__(self) -> "OutputSink":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @abstractmethod
+    def write(self, text: str) -> None:
+        """ Writes the next piece of the text
+
+        Args:
+            text (str):         the text to write, bytes for binary sinks
+        """
+
+    def close(self) -> None:
+        """ Commits the text written so far, after which the sink cannot be written to
+        """
+
+    def abort(self) -> None:
+        """ Drops the text written so far as far as the sink allows it, after a failed expansion
+        """
+        self.close()
+
+class MemorySink(OutputSink):
+    """ Class keeping the resulting text in memory
+
+    Attributes:
+        chunks [str]:       the pieces written so far
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, text: str) -> None:
+        if text:
+            self.chunks.append(text)
+
+    def getvalue(self) -> str:
+        """ Gets the text written so far
+        """
+        text = "".join(self.chunks)
+        self.chunks = [text] if text else []
+        return text
+
+    def abort(self) -> None:
+        self.chunks = []
+
+class StdoutSink(OutputSink):
+    """ Class writing the resulting text to the standard output, or another text stream left open
+
+    The text is written as soon as it arrives, so an aborted expansion leaves what was already written.
+
+    Attributes:
+        stream:             the text stream
+    """
+    def __init__(self, stream=None):
+        """
+        Args:
+            stream:         the text stream, sys.stdout if None
+        """
+        self.stream = sys.stdout if stream is None else stream
+
+    def write(self, text: str) -> None:
+        self.stream.write(text)
+
+    def close(self) -> None:
+        self.stream.flush()
+
+class FileSink(OutputSink):
+    """ Class writing the resulting text directly into a file through a buffer
+
+    The file is truncated when the sink is created, so an aborted expansion leaves a partial file.
+
+    Can throw OSError when the file cannot be opened or written.
+
+    Attributes:
+        path (str):         path of the file
+        file:               the open file
+    """
+    def __init__(self, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE, binary: bool = False):
+        """
+        Args:
+            path (str):         path of the file
+            buffer_size (int):  size of the write buffer in bytes
+            binary (bool):      whether bytes are written instead of text
+        """
+        self.path = path
+        self.file = open(path, 'wb' if binary else 'w', buffering=buffer_size)
+
+    def write(self, text: str) -> None:
+        self.file.write(text)
+
+    def close(self) -> None:
+        self.file.close()
+
+class AtomicFileSink(OutputSink):
+    """ Class writing the resulting text into a temporary file, renamed over the target file once complete
+
+    The target file is replaced at once when the sink is closed and left untouched when it is aborted,
+    so readers never see a partial result. A symbolic link is resolved first, so the file it points to
+    is replaced rather than the link. The temporary file is created next to the target,
+    on the same file system, and gets the permissions of the target, or the default ones for a new file.
+    The target should be a regular file, see open_file_sink.
+
+    Can throw OSError when the files cannot be created, written or renamed.
+
+    Attributes:
+        path (str):         path of the target file, with symbolic links resolved
+        temp_path (str):    path of the temporary file
+        file:               the open temporary file
+    """
+    def __init__(self, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE, binary: bool = False):
+        """
+        Args:
+            path (str):         path of the target file
+            buffer_size (int):  size of the write buffer in bytes
+            binary (bool):      whether bytes are written instead of text
+        """
+        self.path = os.path.realpath(path)
+        directory = os.path.dirname(self.path)
+        (handle, self.temp_path) = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(self.path) + ".",
+                                                    suffix=".tmp")
+        try:
+            os.chmod(self.temp_path, self.__mode())
+            self.file = os.fdopen(handle, 'wb' if binary else 'w', buffering=buffer_size)
+        except BaseException:
+            os.close(handle)
+            os.remove(self.temp_path)
+            raise
+
+    def write(self, text: str) -> None:
+        self.file.write(text)
+
+    def close(self) -> None:
+        try:
+            self.file.close()
+            os.replace(self.temp_path, self.path)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self) -> None:
+        try:
+            self.file.close()
+        except OSError:
+            pass
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+    def __mode(self) -> int:
+        """ Gets the permissions for the temporary file: the ones of the target, or the default ones for new files
+        """
+        try:
+            return os.stat(self.path).st_mode & 0o7777
+        except OSError:
+            # the umask can only be read by setting it
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
+
+def open_file_sink(path: str, buffer_size: int = DEFAULT_BUFFER_SIZE, binary: bool = False) -> OutputSink:
+    """ Opens a sink writing a file, atomically if it is a regular file or does not exist yet
+
+    Devices, pipes and other special files cannot be replaced, e.g. /dev/null or a FIFO read by
+    another process, so they are written in place with a FileSink.
+
+    Can throw OSError when the file cannot be created.
+
+    Args:
+        path (str):         path of the file
+        buffer_size (int):  size of the write buffer in bytes
+        binary (bool):      whether bytes are written instead of text
+    """
+    try:
+        regular = stat.S_ISREG(os.stat(path).st_mode)
+    except FileNotFoundError:
+        regular = True
+    if regular:
+        return AtomicFileSink(path, buffer_size, binary)
+    return FileSink(path, buffer_size, binary)
+
+class SinkOutputBuilder(OutputBuilder):
+    """ Class accumulating output text like OutputBuilder, but passing it on to a sink whenever enough is collected
+
+    Attributes:
+        sink (OutputSink):  the sink receiving the text
+        flush_size (int):   amount of characters collected before they are written to the sink
+        size (int):         amount of characters collected and not written yet
+        written (int):      amount of characters written to the sink so far
+        write_seconds (float): time spent writing to the sink
+    """
+    def __init__(self, sink: OutputSink, flush_size: int = DEFAULT_FLUSH_SIZE):
+        """
+        Args:
+            sink (OutputSink):  the sink receiving the text
+            flush_size (int):   amount of characters collected before they are written to the sink
+        """
+        super().__init__()
+        self.sink = sink
+        self.flush_size = flush_size
+        self.size = 0
+        self.written = 0
+        self.write_seconds = 0.0
+
+    def append(self, text: str) -> None:
+        if text:
+            self.chunks.append(text)
+            self.size = self.size + len(text)
+            if self.size >= self.flush_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """ Writes the collected text to the sink
+        """
+        if self.size == 0:
+            return
+        started = time.perf_counter()
+        self.sink.write("".join(self.chunks))
+        self.write_seconds = self.write_seconds + time.perf_counter() - started
+        self.written = self.written + self.size
+        self.chunks = []
+        self.size = 0
+
+    def build(self) -> str:
+        """ Writes the rest of the collected text to the sink
+
+        Returns:
+            str:    always empty, the text is in the sink
+        """
+        self.flush()
+        return ""
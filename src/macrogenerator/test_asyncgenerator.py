@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+
+from .asyncgenerator import AsyncMacroGenerator
+from .macrogenerator import MacroGenerator, load_prelude
+from error.log import Log
+
+class SlowReader():
+    """ Asynchronous reader returning the text in small pieces, never ending if the text is None
+    """
+    def __init__(self, text: str, delay: float = 0):
+        self.text = text
+        self.delay = delay
+        self.pos = 0
+        self.active = 0
+        self.most_active = 0
+
+    async def read(self, size: int):
+        await asyncio.sleep(self.delay)
+        if self.text is None:
+            await asyncio.Event().wait()
+        chunk = self.text[self.pos:self.pos + min(size, 7)]
+        self.pos = self.pos + len(chunk)
+        return chunk.encode("utf-8")
+
+class ListWriter():
+    """ Asynchronous writer collecting the written data
+    """
+    def __init__(self):
+        self.data = []
+
+    async def write(self, data):
+        self.data.append(data)
+
+class TestAsyncGenerator(unittest.TestCase):
+    """ Tests for the AsyncMacroGenerator class
+    """
+    def setUp(self):
+        (self.prelude, logs) = load_prelude("#P(X){<&X&>}")
+        self.text = "#Q(){ążź}" + "$P(a) $Q() $P( b)\n" * 50
+
+    def test_transform(self):
+        async def run():
+            async with AsyncMacroGenerator(self.prelude, chunk_size=16) as generator:
+                texts = ["$P(%d)" % i for i in range(20)] + [self.text]
+                return await asyncio.gather(*[generator.transform_async(text) for text in texts])
+        results = asyncio.run(run())
+        self.assertEqual(results[3][0], "<3>")
+        expected = MacroGenerator(self.prelude).transform(self.text)
+        self.assertEqual(results[-1][0], expected[0])
+        self.assertEqual([(log.err_code, log.line) for log in results[-1][1]],
+                            [(log.err_code, log.line) for log in expected[1]])
+
+    def test_error(self):
+        async def run():
+            async with AsyncMacroGenerator() as generator:
+                await generator.transform_async("$X()")
+        with self.assertRaises(Log) as cm:
+            asyncio.run(run())
+        self.assertEqual(cm.exception.err_code, "e20")
+
+    def test_stream(self):
+        writer = ListWriter()
+        async def run():
+            async with AsyncMacroGenerator(self.prelude, chunk_size=5) as generator:
+                return await generator.transform_stream_async(SlowReader(self.text), writer, encoding="utf-8")
+        logs = asyncio.run(run())
+        expected = MacroGenerator(self.prelude).transform(self.text)
+        self.assertEqual(b"".join(writer.data).decode("utf-8"), expected[0])
+        self.assertEqual(len(logs), len(expected[1]))
+
+    def test_timeout(self):
+        async def run():
+            async with AsyncMacroGenerator(max_concurrency=1, timeout=0.05) as generator:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await generator.transform_stream_async(SlowReader(None), ListWriter(), encoding="utf-8")
+                # the slot is free again
+                return await generator.transform_async("#A(){a}$A()", timeout=5)
+        self.assertEqual(asyncio.run(run())[0], "a")
+
+    def test_cancel(self):
+        async def run():
+            async with AsyncMacroGenerator(self.prelude, max_concurrency=1) as generator:
+                task = asyncio.ensure_future(generator.transform_stream_async(SlowReader(self.text, 0.01),
+                                                                                ListWriter(), encoding="utf-8"))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                return await asyncio.wait_for(generator.transform_async("x"), 5)
+        self.assertEqual(asyncio.run(run())[0], "x")
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from .batch import collect_inputs, plan_outputs, run_batch
+
+class TestBatch(unittest.TestCase):
+    """ Tests for the batch mode
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        self.inputs = {
+            os.path.join("in", "a"): "#A(P){a&P&}$A(1)",
+            os.path.join("in", "sub", "b"): "#B(){b}$B() $B()",
+            os.path.join("in", "c"): "$C()",
+        }
+        for (path, text) in self.inputs.items():
+            os.makedirs(os.path.join(self.root, os.path.dirname(path)), exist_ok=True)
+            with open(os.path.join(self.root, path), 'w') as file:
+                file.write(text)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, *parts) -> str:
+        return os.path.join(self.root, *parts)
+
+    def test_collect(self):
+        expected = [self.path("in", "a"), self.path("in", "c"), self.path("in", "sub", "b")]
+        self.assertEqual(collect_inputs([self.path("in")]), expected)
+        self.assertEqual(collect_inputs([self.path("in", "*")]), expected[:2])
+        manifest = self.path("manifest")
+        with open(manifest, 'w') as file:
+            file.write(expected[2] + "\n\n" + expected[0] + "\n")
+        self.assertEqual(collect_inputs(["@" + manifest]), [expected[0], expected[2]])
+
+    def test_plan(self):
+        inputs = collect_inputs([self.path("in")])
+        outputs = [output for (input_file, output) in plan_outputs(inputs, self.path("out"))]
+        self.assertEqual(outputs, [self.path("out", "a"), self.path("out", "c"), self.path("out", "sub", "b")])
+
+    def test_run(self):
+        jobs = plan_outputs(collect_inputs([self.path("in")]), self.path("out"))
+        for workers in [1, 2]:
+            results = run_batch(jobs, workers)
+            self.assertEqual([result.input_file for result in results], [job[0] for job in jobs])
+            self.assertEqual([log.err_code for log in results[0].logs], [])
+            self.assertEqual(results[1].error.err_code, "e20")
+            self.assertIsNone(results[2].error)
+            with open(self.path("out", "a"), 'r') as file:
+                self.assertEqual(file.read(), "a1")
+            with open(self.path("out", "sub", "b"), 'r') as file:
+                self.assertEqual(file.read(), "b b")
+
+    def test_max_warnings(self):
+        with open(self.path("in", "a"), 'w') as file:
+            file.write("#A(P){a&P&}" + "$A()" * 5)
+        jobs = plan_outputs(collect_inputs([self.path("in")]), self.path("out"))
+        for workers in [1, 2]:
+            results = run_batch(jobs, workers, max_warnings=2)
+            self.assertEqual([log.err_code for log in results[0].logs], ["w21", "w21"])
+            self.assertEqual(results[0].warnings_dropped, 3)
+            self.assertEqual(results[2].warnings_dropped, 0)
+
+    def test_binary_input(self):
+        with open(self.path("in", "binary"), 'wb') as file:
+            file.write(b"\xff\xfe\x00text")
+        jobs = plan_outputs(collect_inputs([self.path("in")]), self.path("out"))
+        for workers in [1, 2]:
+            results = run_batch(jobs, workers)
+            self.assertEqual([result.input_file for result in results], [job[0] for job in jobs])
+            self.assertEqual(results[1].error.err_code, "e98")
+            self.assertIsNone(results[0].error)
+            self.assertFalse(os.path.exists(self.path("out", "binary")))
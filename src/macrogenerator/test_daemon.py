@@ -0,0 +1,132 @@
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import unittest
+
+from .daemon import Daemon, send_requests, shutdown
+
+class TestDaemon(unittest.TestCase):
+    """ Tests for the Daemon class
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.prelude = self.path("prelude")
+        self.write(self.prelude, "#P(X){[&X&]}")
+        self.write(self.path("a.in"), "$P(a) #L(){l}$L()")
+        self.daemon = Daemon(self.prelude)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, *parts) -> str:
+        return os.path.join(self.directory.name, *parts)
+
+    def write(self, path: str, text: str) -> None:
+        with open(path, 'w') as file:
+            file.write(text)
+        # make sure the change is seen even on coarse file system timestamps
+        status = os.stat(path)
+        os.utime(path, ns=(status.st_atime_ns, status.st_mtime_ns + 1000000000))
+
+    def read(self, path: str) -> str:
+        with open(path, 'r') as file:
+            return file.read()
+
+    def test_expand(self):
+        result = self.daemon.expand(self.path("a.in"), self.path("out", "a"))
+        self.assertIsNone(result.error)
+        self.assertEqual(self.read(self.path("out", "a")), "[a] l")
+        generator = self.daemon.generators[self.path("a.in")]
+        self.daemon.expand(self.path("a.in"), self.path("out", "a"))
+        self.assertIs(self.daemon.generators[self.path("a.in")], generator)
+
+    def test_prelude_reload(self):
+        self.daemon.expand(self.path("a.in"), self.path("a.out"))
+        self.write(self.prelude, "#P(X){(&X&)}")
+        result = self.daemon.expand(self.path("a.in"), self.path("a.out"))
+        self.assertIsNone(result.error)
+        self.assertEqual(self.read(self.path("a.out")), "(a) l")
+        self.assertEqual(self.daemon.prelude_version, 2)
+
+        self.write(self.prelude, "#P(X){")
+        result = self.daemon.expand(self.path("a.in"), self.path("a.out"))
+        self.assertEqual(result.input_file, self.prelude)
+        self.assertEqual(result.error.err_code, "e18")
+
+    def test_errors(self):
+        self.assertEqual(self.daemon.expand(self.path("none"), self.path("a.out")).error.err_code, "e98")
+        self.write(self.path("b.in"), "$Q()")
+        self.assertEqual(self.daemon.expand(self.path("b.in"), self.path("b.out")).error.err_code, "e20")
+        with open(self.path("c.in"), 'wb') as file:
+            file.write(b"\xff\xfe\x00text")
+        self.assertEqual(self.daemon.expand(self.path("c.in"), self.path("c.out")).error.err_code, "e98")
+        self.assertNotIn(self.path("c.in"), self.daemon.generators)
+
+        results = []
+        self.daemon.watch([(self.path("c.in"), self.path("c.out")), (self.path("a.in"), self.path("a.out"))],
+                            results.append, 0, 1)
+        self.assertEqual([result.error is None for result in results], [False, True])
+
+    def test_generator_limit(self):
+        daemon = Daemon(self.prelude, max_generators=2)
+        for name in ["a", "b", "c", "a", "d"]:
+            self.write(self.path(name + ".in"), "$P(%s)" % name)
+            self.assertIsNone(daemon.expand(self.path(name + ".in"), self.path(name + ".out")).error)
+        self.assertEqual(list(daemon.generators), [self.path("a.in"), self.path("d.in")])
+        os.remove(self.path("d.in"))
+        self.assertEqual(daemon.expand(self.path("d.in"), self.path("d.out")).error.err_code, "e98")
+        self.assertEqual(list(daemon.generators), [self.path("a.in")])
+
+    def test_watch(self):
+        results = []
+        jobs = [(self.path("a.in"), self.path("a.out"))]
+        self.daemon.watch(jobs, results.append, 0, 2)
+        self.assertEqual(len(results), 1)
+        self.write(self.path("a.in"), "$P(b)")
+        self.daemon.watch(jobs, results.append, 0, 1)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(self.read(self.path("a.out")), "[b]")
+
+    def test_serve(self):
+        socket_path = self.path("socket")
+        server = threading.Thread(target=self.daemon.serve, args=(socket_path,))
+        server.start()
+        try:
+            for attempt in range(100):
+                if os.path.exists(socket_path):
+                    break
+                threading.Event().wait(0.01)
+            jobs = [(self.path("a.in"), self.path("a.out")), (self.path("none"), self.path("b.out"))]
+            results = send_requests(socket_path, jobs)
+            self.assertEqual([result.input_file for result in results], [job[0] for job in jobs])
+            self.assertIsNone(results[0].error)
+            self.assertEqual(results[1].error.err_code, "e98")
+            self.assertEqual(self.read(self.path("a.out")), "[a] l")
+        finally:
+            shutdown(socket_path)
+            server.join()
+        self.assertFalse(os.path.exists(socket_path))
+
+    def test_serve_path(self):
+        socket_path = self.path("precious.txt")
+        self.write(socket_path, "data")
+        with self.assertRaises(FileExistsError):
+            self.daemon.serve(socket_path)
+        self.assertEqual(self.read(socket_path), "data")
+
+    def test_invalid_response(self):
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.rfile.readline()
+                self.wfile.write(json.dumps({"invalid": "bad request"}).encode("utf-8") + b"\n")
+
+        socket_path = self.path("socket")
+        with socketserver.UnixStreamServer(socket_path, Handler) as server:
+            thread = threading.Thread(target=server.handle_request)
+            thread.start()
+            results = send_requests(socket_path, [(self.path("a.in"), self.path("a.out"))])
+            thread.join()
+        self.assertEqual((results[0].input_file, results[0].error.err_code), (self.path("a.in"), "e98"))
+        self.assertEqual(list(results[0].error.args), ["bad request"])
@@ -0,0 +1,31 @@
+import unittest
+
+from .expansioncache import ExpansionCache
+from .macro import Macro
+
+class TestExpansionCache(unittest.TestCase):
+    """ Tests for the ExpansionCache class
+    """
+    def test_lru(self):
+        macro = Macro("M", ["A"], "&A&")
+        cache = ExpansionCache(2)
+        self.assertIsNone(cache.get(macro, ("a",)))
+        cache.put(macro, ("a",), "a", ())
+        cache.put(macro, ("b",), "b", (("w22", ("M", " b")),))
+        self.assertEqual(cache.get(macro, ("a",)), ("a", ()))
+        cache.put(macro, ("c",), "c", ())
+        self.assertIsNone(cache.get(macro, ("b",)))
+        self.assertEqual(cache.get(macro, ("a",)), ("a", ()))
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 2, 2))
+        self.assertEqual(cache.get_hit_rate(), 0.5)
+        cache.clear()
+        self.assertEqual((cache.hits, cache.misses, len(cache), cache.get_hit_rate()), (0, 0, 0, 0.0))
+
+    def test_identity(self):
+        cache = ExpansionCache()
+        first = Macro("M", ["A"], "1&A&")
+        second = Macro("M", ["A"], "2&A&")
+        cache.put(first, ("a",), "1a", ())
+        self.assertIsNone(cache.get(second, ("a",)))
+        with self.assertRaises(ValueError):
+            ExpansionCache(0)
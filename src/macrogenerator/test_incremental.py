@@ -0,0 +1,79 @@
+import unittest
+
+from .incremental import IncrementalGenerator, common_prefix_length, common_suffix_length
+from .macro import Macro
+from .macrogenerator import MacroGenerator
+from error.log import Log
+
+class TestIncremental(unittest.TestCase):
+    """ Tests for the IncrementalGenerator class
+    """
+    def setUp(self):
+        self.generator = IncrementalGenerator()
+        self.text = \
+            """#LINK(URL){<a href="&URL&">&URL&</a>}
+            #BOLD(TEXT){<b>&TEXT&</b>}
+            $LINK(a.html) $BOLD(x)
+            $LINK(b.html), $BOLD( y)
+            #UNUSED(){}
+            $LINK(c.html)"""
+
+    def log_tuples(self, logs: [Log]) -> [tuple]:
+        return [(log.err_code, log.line, list(log.args)) for log in logs]
+
+    def assertFullRun(self, text: str):
+        (output, logs) = self.generator.transform(text)
+        (full_output, full_logs) = MacroGenerator().transform(text)
+        self.assertEqual(output, full_output)
+        self.assertEqual(self.log_tuples(logs), self.log_tuples(full_logs))
+
+    def test_common_lengths(self):
+        first = "a" * 10000 + "bc" + "d" * 9000
+        second = "a" * 10000 + "xyz" + "d" * 9000
+        self.assertEqual(common_prefix_length(first, second), 10000)
+        self.assertEqual(common_suffix_length(first, second, 9002), 9000)
+        self.assertEqual(common_suffix_length(first, second, 10), 10)
+
+    def test_unchanged(self):
+        self.assertFullRun(self.text)
+        self.assertFullRun(self.text)
+        self.assertGreaterEqual(self.generator.reused, len(self.generator.spans) - 1)
+
+    def test_edit_text(self):
+        self.assertFullRun(self.text)
+        self.assertFullRun(self.text.replace("$LINK(b.html),", "$LINK(b.html) and\n\n"))
+        self.assertGreater(self.generator.reused, 0)
+
+    def test_edit_call(self):
+        self.assertFullRun(self.text)
+        self.assertFullRun(self.text.replace("$BOLD(x)", "$BOLD(z,\n)"))
+
+    def test_edit_definition(self):
+        self.assertFullRun(self.text)
+        expanded = []
+        original = Macro.expand
+        def counting_expand(macro, args):
+            expanded.append(macro.name)
+            return original(macro, args)
+        Macro.expand = counting_expand
+        text = self.text.replace("<b>", "<strong>")
+        try:
+            (output, logs) = self.generator.transform(text)
+        finally:
+            Macro.expand = original
+        self.assertEqual(expanded, ["BOLD", "BOLD"])
+        self.assertEqual(output, MacroGenerator().transform(text)[0])
+
+    def test_definition_moved(self):
+        self.assertFullRun(self.text)
+        text = self.text.replace("#UNUSED(){}", "#UNUSED(){unused}").replace("$LINK(c.html)", "$UNUSED()")
+        self.assertFullRun(text)
+        self.assertFullRun(text.replace("{<b>&TEXT&</b>}", "{<i>&TEXT&</i>}\n"))
+
+    def test_error_and_recovery(self):
+        self.assertFullRun(self.text)
+        with self.assertRaises(Log) as cm:
+            self.generator.transform(self.text.replace("#BOLD", "#LINK"))
+        self.assertEqual(cm.exception.err_code, "e11")
+        self.assertIsNone(self.generator.spans)
+        self.assertFullRun(self.text)
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+from . import librarycache
+from .librarycache import LibraryCache, CACHE_SUFFIX
+from .macro import Macro
+from symbol.symbolset import get_symbol_set
+
+class TestLibraryCache(unittest.TestCase):
+    """ Tests for the LibraryCache class
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = LibraryCache(self.directory.name)
+        self.prelude = \
+            """#COURSE(NAME,SHORT){Course &NAME& (&SHORT&) \\& more}
+            #EMPTY(){}"""
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def entries(self) -> [str]:
+        return [name for name in os.listdir(self.directory.name) if name.endswith(CACHE_SUFFIX)]
+
+    def test_miss_and_hit(self):
+        self.assertIsNone(self.cache.load(self.prelude))
+        (library, logs) = self.cache.load_prelude(self.prelude)
+        self.assertEqual(len(self.entries()), 1)
+
+        (cached, cached_logs) = self.cache.load(self.prelude)
+        self.assertTrue(cached.frozen)
+        self.assertEqual([(m.name, m.arguments, m.body, m.literals, m.slots) for m in cached.library],
+                            [(m.name, m.arguments, m.body, m.literals, m.slots) for m in library.library])
+        self.assertEqual([(log.err_code, log.line, log.args) for log in cached_logs],
+                            [(log.err_code, log.line, log.args) for log in logs])
+        self.assertEqual(cached.get_macro("COURSE").expand(["ECOTE", "E"]), "Course ECOTE (E) & more")
+
+    def test_no_relexing(self):
+        self.cache.load_prelude(self.prelude)
+        compile = Macro._Macro__compile
+        try:
+            Macro._Macro__compile = None
+            self.assertIsNotNone(self.cache.load(self.prelude))
+        finally:
+            Macro._Macro__compile = compile
+
+    def test_invalidation(self):
+        self.cache.load_prelude(self.prelude)
+        self.assertIsNone(self.cache.load(self.prelude + " "))
+        self.assertNotEqual(self.cache.key(self.prelude), self.cache.key(self.prelude + " "))
+        key = self.cache.key(self.prelude)
+        cache_format = librarycache.CACHE_FORMAT
+        try:
+            librarycache.CACHE_FORMAT = cache_format.replace("python", "python 0")
+            self.assertNotEqual(self.cache.key(self.prelude), key)
+        finally:
+            librarycache.CACHE_FORMAT = cache_format
+
+    def test_syntax(self):
+        symbols = get_symbol_set("shell")
+        prelude = self.prelude.replace("#", "@").replace("\\", "^")
+        self.cache.load_prelude(self.prelude)
+        self.assertIsNone(self.cache.load(prelude, symbols))
+        (library, logs) = self.cache.load_prelude(prelude, symbols)
+        self.assertEqual(library.get_macro("COURSE").expand(["ECOTE", "E"]), "Course ECOTE (E) & more")
+        self.assertIsNotNone(self.cache.load(prelude, symbols))
+        self.assertEqual(len(self.entries()), 2)
+
+    def test_corruption(self):
+        self.cache.load_prelude(self.prelude)
+        path = os.path.join(self.directory.name, self.entries()[0])
+        with open(path, 'r+b') as file:
+            file.seek(-1, os.SEEK_END)
+            byte = file.read(1)
+            file.seek(-1, os.SEEK_END)
+            file.write(bytes([byte[0] ^ 0xFF]))
+        self.assertIsNone(self.cache.load(self.prelude))
+        self.assertEqual(self.entries(), [])
+
+    def test_eviction(self):
+        self.cache.load_prelude(self.prelude)
+        size = os.path.getsize(os.path.join(self.directory.name, self.entries()[0]))
+        self.cache.max_size = size * 2 + size // 2
+        old = os.path.join(self.directory.name, self.entries()[0])
+        os.utime(old, (0, 0))
+        self.cache.load_prelude(self.prelude + "\n#A(){a}")
+        self.cache.load_prelude(self.prelude + "\n#B(){b}")
+        self.assertEqual(len(self.entries()), 2)
+        self.assertFalse(os.path.exists(old))
@@ -0,0 +1,24 @@
+import unittest
+from .macro import Macro
+
+class TestMacro(unittest.TestCase):
+    """ Tests for the Macro class
+    """
+    def test_compile(self):
+        macro = Macro("MacroName", ["A", "B"], "x&B&y&A&\\&z")
+        self.assertEqual(macro.literals, ("x", "y", "&z"))
+        self.assertEqual(macro.slots, (1, 0))
+
+    def test_compile_no_args(self):
+        macro = Macro("MacroName", [], "plain \\$ body")
+        self.assertEqual(macro.literals, ("plain $ body",))
+        self.assertEqual(macro.slots, ())
+
+    def test_expand(self):
+        macro = Macro("MacroName", ["A", "B"], "&A&+&B&*&A&")
+        self.assertEqual(macro.expand(["34", "20"]), "34+20*34")
+        self.assertEqual(macro.expand(["1", "2", "3"]), "1+2*1")
+
+    def test_undefined_argument(self):
+        with self.assertRaises(ValueError):
+            Macro("MacroName", ["A"], "&B&")
@@ -1,7 +1,14 @@
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import sys
+import tempfile
 import unittest
 
-from .macrogenerator import MacroGenerator
+from .macrogenerator import MacroGenerator, load_prelude
+from error.errorlibrary import get_error_lib
 from error.log import Log
+from symbol.symbolset import DEFAULT_SYMBOLS, get_symbol_set
 
 class TestMacroGenerator(unittest.TestCase):
     """ Tests for the MacroGenerator class
@@ -294,4 +301,285 @@ class TestMacroGenerator(unittest.TestCase):
         (out_str, out_log) = self.generator.transform(text_in)
         self.assertEqual(out_str, text_out)
         self.assertEqual(len(out_log), 1)
-        self.assertEqual(out_log[0].err_code, warn)
\ No newline at end of file
+        self.assertEqual(out_log[0].err_code, warn)
+
+    # Line Numbers
+    def test_warning_lines(self):
+        text_in = \
+            "line1\nline2\n#MACRO(){}\n$MACRO()\n\\a\n#B(){b}"
+        text_out = \
+            "line1\nline2\n\na\n"
+        (out_str, out_log) = self.generator.transform(text_in)
+        self.assertEqual(out_str, text_out)
+        self.assertEqual([(log.err_code, log.line) for log in out_log],
+                            [("w11", 4), ("w90", 5), ("w12", None)])
+
+    # Call Counts
+    def test_call_counts(self):
+        text_in = \
+            """#A(){a}#B(){b}#C(){c}
+            $B()$A()$B()$B()$A()"""
+        (out_str, out_log) = self.generator.transform(text_in)
+        self.assertEqual([log.err_code for log in out_log], ["w12"])
+        self.assertEqual(self.generator.get_call_counts(), {"A": 2, "B": 3, "C": 0})
+        self.assertEqual(self.generator.get_hot_macros(2), [("B", 3), ("A", 2)])
+
+    # Streaming
+    def test_stream(self):
+        text_in = \
+            """free text \\$
+            #MACRO1(){test macro}
+            #MACRO2(P1, P2)
+            {&P1&+&P2&*&P1&}
+            $MACRO2(34, 20)
+            $MACRO1()
+            MORE TEXT"""
+        (text_out, logs) = MacroGenerator().transform(text_in)
+        for chunk_size in [1, 2, 3, 7, 1000]:
+            writer = io.StringIO()
+            out_log = MacroGenerator().transform_stream(io.StringIO(text_in), writer, chunk_size)
+            self.assertEqual(writer.getvalue(), text_out)
+            self.assertEqual([(log.err_code, log.line) for log in out_log],
+                                [(log.err_code, log.line) for log in logs])
+
+    def test_stream_error(self):
+        text_in = \
+            """#A(P){hello &P&}
+            $A("""
+        with self.assertRaises(Log) as cm:
+            self.generator.transform_stream(io.StringIO(text_in), io.StringIO(), 4)
+        self.assertEqual(cm.exception.err_code, "e25")
+        self.assertEqual(cm.exception.line, 2)
+
+    def test_w90_trailing_escape(self):
+        text_in = \
+            """text\\"""
+        (out_str, out_log) = self.generator.transform(text_in)
+        self.assertEqual(out_str, "text")
+        self.assertEqual([log.err_code for log in out_log], ["w90"])
+        self.assertEqual(out_log[0].args, ("",))
+        self.assertEqual(get_error_lib().what_long(out_log[0]),
+                            "w90 Escape Character Error at line 1. Escape Character was used at the end of the input.")
+
+    # Memory-mapped input
+    def test_mapped(self):
+        text_in = \
+            """zażółć \\$
+            #MACRO2(P1, P2)
+            {&P1&+&P2&*&P1&}
+            $MACRO2(34, 20ę)
+            MORE TEXT"""
+        (text_out, logs) = MacroGenerator().transform(text_in)
+        for window_size in [1, 256]:
+            with tempfile.TemporaryFile() as reader:
+                reader.write(text_in.encode("utf-8"))
+                reader.seek(0)
+                writer = io.BytesIO()
+                out_log = MacroGenerator().transform_mapped(reader, writer, window_size)
+            self.assertEqual(writer.getvalue().decode("utf-8"), text_out)
+            self.assertEqual([(log.err_code, log.line) for log in out_log],
+                                [(log.err_code, log.line) for log in logs])
+
+    def test_mapped_fallback(self):
+        text_in = \
+            """#MACRO(A){hello &A&}
+            $MACRO(big \\$)"""
+        writer = io.BytesIO()
+        out_log = self.generator.transform_mapped(io.BytesIO(text_in.encode("utf-8")), writer)
+        self.assertEqual(writer.getvalue().decode("utf-8"), "hello big $")
+        self.assertEqual(out_log, [])
+
+    def test_mapped_newlines(self):
+        text_in = "a\r\nb\\q#A(P){&P&x}\r$A(\r)\rc\r\n$A()"
+        with tempfile.NamedTemporaryFile('wb', delete=False) as file:
+            file.write(text_in.encode("utf-8"))
+        try:
+            with open(file.name, 'r') as reader:
+                expected = self.generator.transform(reader.read())
+            with open(file.name, 'rb') as reader:
+                writer = io.BytesIO()
+                out_log = self.generator.transform_mapped(reader, writer)
+        finally:
+            os.remove(file.name)
+        self.assertEqual(writer.getvalue().decode("utf-8"), expected[0])
+        self.assertEqual([(log.err_code, log.line) for log in out_log],
+                            [(log.err_code, log.line) for log in expected[1]])
+
+    # Prelude
+    def test_prelude(self):
+        (prelude, prelude_log) = load_prelude(
+            """#MACRO1(){test macro}
+            #MACRO2(P1, P2){&P1&+&P2&}
+            #EMPTY(){}""")
+        self.assertEqual([log.err_code for log in prelude_log], ["w11"])
+        self.assertTrue(prelude.frozen)
+
+        text_in = \
+            """#MACRO3(P){&P&!}
+            $MACRO2(1,2)$MACRO3(3)"""
+        (out_str, out_log) = MacroGenerator(prelude).transform(text_in)
+        self.assertEqual(out_str, "1+23!")
+        self.assertEqual(out_log, [])
+        (out_str, out_log) = MacroGenerator(prelude, True).transform(text_in)
+        self.assertEqual([log.args for log in out_log], [("MACRO1",), ("EMPTY",)])
+        self.assertEqual(len(prelude.library), 3)
+
+        with self.assertRaises(Log) as cm:
+            MacroGenerator(prelude).transform("#MACRO1(){again}")
+        self.assertEqual(cm.exception.err_code, "e11")
+
+    def test_max_warnings(self):
+        text_in = \
+            """#A(P,Q){&P&}#B(){}
+            $A(, x)$A( y,)"""
+        (text_out, logs) = self.generator.transform(text_in)
+        self.assertEqual([log.err_code for log in logs], ["w10", "w11", "w21", "w22", "w22", "w21", "w12"])
+        generator = MacroGenerator(collect_stats=True, max_warnings=3)
+        (out_str, out_log) = generator.transform(text_in)
+        self.assertEqual(out_str, text_out)
+        self.assertEqual([(log.err_code, log.line) for log in out_log], [(log.err_code, log.line) for log in logs[:3]])
+        self.assertEqual(generator.context.warnings_dropped, 4)
+        self.assertEqual(generator.get_stats().warnings, 7)
+        self.assertEqual(str(out_log[0]), "w10 Unused Parameter at line 1.")
+
+    def test_interned_names(self):
+        text_in = \
+            """#MACRO(ARG1,ARG2){&ARG1&&ARG2&}
+            $MACRO(, x)$MACRO(y,)"""
+        (out_str, out_log) = self.generator.transform(text_in)
+        macro = self.generator.context.macro_library.get_macro("MACRO")
+        self.assertEqual([log.err_code for log in out_log], ["w21", "w22", "w21"])
+        for log in out_log:
+            self.assertIs(log.args[0], macro.name)
+        self.assertIs(list(self.generator.get_call_counts())[0], macro.name)
+
+    # Expansion cache
+    def test_cache(self):
+        text_in = \
+            """#MACRO(ARG1,ARG2){<&ARG1&|&ARG2&>}#EMPTY(){e}
+            $MACRO(a,b)$MACRO(, x)
+            $MACRO(a,b)$MACRO(, x)$MACRO(a,b,c)$EMPTY()
+            $MACRO(, x)$MACRO(a,b,c)$EMPTY()$EMPTY(1)"""
+        expected = self.generator.transform(text_in)
+        generator = MacroGenerator(cache_size=2, collect_stats=True)
+        (out_str, out_log) = generator.transform(text_in)
+        self.assertEqual(out_str, expected[0])
+        self.assertEqual([(log.err_code, log.line, log.args) for log in out_log],
+                            [(log.err_code, log.line, log.args) for log in expected[1]])
+        stats = generator.get_stats()
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (2, 8))
+        self.assertEqual((generator.cache.hits, generator.cache.misses, len(generator.cache)), (2, 8, 2))
+
+        # the warnings of cached calls are counted against the limit as well
+        limited = MacroGenerator(max_warnings=3, cache_size=16)
+        self.assertEqual([(log.err_code, log.line) for log in limited.transform(text_in)[1]],
+                            [(log.err_code, log.line) for log in expected[1][:3]])
+        self.assertEqual(limited.context.warnings_dropped, len(expected[1]) - 3)
+
+        # a macro defined again in the next run is a new macro, the old expansions do not apply
+        (prelude, prelude_log) = load_prelude("#PRE(X){[&X&]}")
+        generator = MacroGenerator(prelude, cache_size=16)
+        self.assertEqual(generator.transform("#M(X){1&X&}$M(a)$PRE(a)")[0], "1a[a]")
+        self.assertEqual(generator.transform("#M(X){2&X&}$M(a)$PRE(a)")[0], "2a[a]")
+        self.assertEqual((generator.cache.hits, generator.cache.misses), (1, 3))
+
+    # Syntax
+    def test_syntax(self):
+        text_in = \
+            """free text \\$ \\@ (a, b) {c} & d
+            #MACRO1(){test macro}
+            #MACRO2(P1, P2)
+            {(&P1&+&P2&)*&P1&, \\{\\}}
+            $MACRO2(34,  20)
+            $MACRO1(x)$MACRO2(,1)
+            #UNUSED(A){}"""
+        (prelude, prelude_log) = load_prelude("#PRE(X){[&X&]}")
+        (text_out, logs) = MacroGenerator(prelude).transform(text_in + "$PRE(p)")
+
+        # swapping every symbol with its replacement gives the same text in the other syntax
+        symbols = get_symbol_set("@%[]<>!;~")
+        swap = str.maketrans(DEFAULT_SYMBOLS.as_string() + symbols.as_string(),
+                                symbols.as_string() + DEFAULT_SYMBOLS.as_string())
+        (prelude, prelude_log) = load_prelude("#PRE(X){[&X&]}".translate(swap), symbols)
+        generator = MacroGenerator(prelude, symbols=symbols)
+        (out_str, out_log) = generator.transform((text_in + "$PRE(p)").translate(swap))
+        self.assertEqual(out_str, text_out.translate(swap))
+        self.assertEqual([(log.err_code, log.line, [arg.translate(swap) for arg in log.args]) for log in out_log],
+                            [(log.err_code, log.line, list(log.args)) for log in logs])
+
+        with tempfile.TemporaryFile() as reader:
+            reader.write(text_in.replace("#", "§").encode("utf-8"))
+            reader.seek(0)
+            writer = io.BytesIO()
+            MacroGenerator(symbols=get_symbol_set("§$(){}&,\\")).transform_mapped(reader, writer, 8)
+        self.assertEqual(writer.getvalue().decode("utf-8"), MacroGenerator().transform(text_in)[0])
+
+        with self.assertRaises(Log) as cm:
+            MacroGenerator(symbols=symbols).transform("%MACRO[]")
+        self.assertEqual(cm.exception.err_code, "e20")
+
+    # Reentrancy
+    def test_reuse(self):
+        text_in = \
+            """#A(){a}#B(){b}
+            $A()$A()"""
+        for run in range(3):
+            (out_str, out_log) = self.generator.transform(text_in)
+            self.assertEqual(out_str.strip(), "aa")
+            self.assertEqual([log.args for log in out_log], [("B",)])
+            self.assertEqual(self.generator.get_call_counts(), {"A": 2, "B": 0})
+
+    def test_threads(self):
+        (prelude, prelude_log) = load_prelude("#WRAP(T){<&T&>}#PAIR(A,B){&A&=&B&}")
+        generator = MacroGenerator(prelude)
+        texts = ["#M%d(X){%d:&X&}\n$WRAP($M%d(%d))" % (i, i, i, i) for i in range(50)]
+        texts = [text.replace("$WRAP($M%d(%d))" % (i, i), "$M%d(%d) $PAIR(%d, x)\n" % (i, i, i) * (i + 1))
+                    for (i, text) in enumerate(texts)]
+        expected = [MacroGenerator(prelude).transform(text) for text in texts]
+
+        def run(index: int):
+            (out_str, out_log) = generator.transform(texts[index % len(texts)])
+            counts = generator.get_call_counts()
+            return index, out_str, [(log.err_code, log.line, log.args) for log in out_log], counts
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                results = list(executor.map(run, range(800)))
+        finally:
+            sys.setswitchinterval(interval)
+
+        for (index, out_str, out_log, counts) in results:
+            (text_out, logs) = expected[index % len(texts)]
+            self.assertEqual(out_str, text_out)
+            self.assertEqual(out_log, [(log.err_code, log.line, log.args) for log in logs])
+            self.assertEqual(counts["M%d" % (index % len(texts))], index % len(texts) + 1)
+            self.assertEqual(sum(counts.values()), 2 * (index % len(texts) + 1))
+        self.assertEqual(len(prelude.library), 2)
+
+    # Statistics
+    def test_stats(self):
+        text_in = \
+            """#A(P){a&P&}#B(){b}#C(){}
+            $B()$A(1)$B()$A()"""
+        self.generator.transform(text_in)
+        self.assertIsNone(self.generator.get_stats())
+
+        generator = MacroGenerator(collect_stats=True)
+        (out_str, out_log) = generator.transform(text_in)
+        stats = generator.get_stats()
+        self.assertEqual((stats.chars_scanned, stats.chars_emitted), (len(text_in), len(out_str)))
+        self.assertEqual((stats.macros_defined, stats.calls_expanded, stats.warnings), (3, 4, len(out_log)))
+        self.assertEqual(sorted((name, calls) for (name, calls, seconds) in stats.get_costly_macros(5)),
+                            [("A", 2), ("B", 2)])
+        self.assertEqual(list(stats.get_phases()),
+                            ["total", "definitions", "calls", "substitution", "warnings", "text"])
+        self.assertEqual(stats.as_dict(1)["calls_expanded"], 4)
+
+        writer = io.StringIO()
+        generator.transform_stream(io.StringIO(text_in), writer, 5)
+        stats = generator.get_stats()
+        self.assertEqual((stats.chars_scanned, stats.chars_emitted, stats.calls_expanded),
+                            (len(text_in), len(writer.getvalue()), 4))
+        self.assertIn("io", stats.get_phases())
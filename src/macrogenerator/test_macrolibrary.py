@@ -1,3 +1,4 @@
+import time
 import unittest
 from .macrolibrary import MacroLibrary, MacroLibException
 from .macro import Macro
@@ -38,4 +39,40 @@ class TestMacroLibrary(unittest.TestCase):
         self.assertEqual(macro.arguments, self.args)
         self.assertEqual(macro.body, self.body)
         
-        
\ No newline at end of file
+        
+
+    def test_order(self):
+        names = ["C", "A", "B"]
+        for name in names:
+            self.library.insert_macro(Macro(name, [], ""))
+        self.assertEqual([m.name for m in self.library.library], names)
+
+    def test_benchmark_scaling(self):
+        # insert and lookup cost per macro should not grow with the library size
+        costs = []
+        for count in [1000, 10000, 100000]:
+            library = MacroLibrary()
+            macros = [Macro("MACRO" + str(i), [], "") for i in range(count)]
+            start = time.perf_counter()
+            for macro in macros:
+                library.insert_macro(macro)
+            for macro in macros:
+                library.get_macro(macro.name)
+            costs.append((time.perf_counter() - start) / count)
+        self.assertLess(costs[-1], costs[0] * 10)
+
+    def test_extend(self):
+        self.library.insert_macro(Macro(self.name, self.args, self.body))
+        child = self.library.extend()
+        self.assertTrue(self.library.frozen)
+        with self.assertRaises(MacroLibException):
+            self.library.insert_macro(Macro("Other", [], ""))
+
+        self.assertIs(child.get_macro(self.name), self.library.get_macro(self.name))
+        with self.assertRaises(MacroLibException):
+            child.insert_macro(Macro(self.name, [], ""))
+        child.insert_macro(Macro("Other", [], ""))
+        self.assertEqual([m.name for m in child.library], [self.name, "Other"])
+        self.assertEqual(len(self.library.library), 1)
+        with self.assertRaises(MacroLibException):
+            self.library.get_macro("Other")
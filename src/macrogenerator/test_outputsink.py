@@ -0,0 +1,131 @@
+import io
+import os
+import stat
+import tempfile
+import threading
+import unittest
+
+from error.log import Log
+from .macrogenerator import MacroGenerator
+from .outputsink import AtomicFileSink, FileSink, MemorySink, OutputSink, SinkOutputBuilder, StdoutSink, open_file_sink
+
+class TestOutputSink(unittest.TestCase):
+    """ Tests for the output sinks
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "out")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self) -> str:
+        with open(self.path, 'r') as file:
+            return file.read()
+
+    def test_memory(self):
+        with MemorySink() as sink:
+            sink.write("a")
+            sink.write("")
+            sink.write("bc")
+        self.assertEqual(sink.getvalue(), "abc")
+        sink.abort()
+        self.assertEqual(sink.getvalue(), "")
+        with self.assertRaises(TypeError):
+            OutputSink()
+
+    def test_stdout(self):
+        stream = io.StringIO()
+        with StdoutSink(stream) as sink:
+            sink.write("text")
+        self.assertEqual(stream.getvalue(), "text")
+
+    def test_file(self):
+        with FileSink(self.path, 4) as sink:
+            sink.write("direct")
+        self.assertEqual(self.read(), "direct")
+
+    def test_atomic(self):
+        with open(self.path, 'w') as file:
+            file.write("old")
+        os.chmod(self.path, 0o640)
+
+        sink = AtomicFileSink(self.path)
+        sink.write("new")
+        self.assertEqual(self.read(), "old")
+        sink.close()
+        self.assertEqual(self.read(), "new")
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+
+        with self.assertRaises(ValueError):
+            with AtomicFileSink(self.path) as sink:
+                sink.write("partial")
+                raise ValueError()
+        self.assertEqual(self.read(), "new")
+        self.assertEqual(os.listdir(self.directory.name), ["out"])
+
+    def test_symlink(self):
+        target = os.path.join(self.directory.name, "target")
+        with open(target, 'w') as file:
+            file.write("old")
+        os.symlink(target, self.path)
+        with open_file_sink(self.path) as sink:
+            sink.write("new")
+        self.assertTrue(os.path.islink(self.path))
+        self.assertEqual(self.read(), "new")
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ["out", "target"])
+
+    def test_special_files(self):
+        with open_file_sink(os.devnull) as sink:
+            self.assertIsInstance(sink, FileSink)
+            sink.write("discarded")
+        self.assertTrue(os.path.exists(os.devnull))
+
+        os.mkfifo(self.path)
+        received = []
+        def read():
+            with open(self.path, 'r') as file:
+                received.append(file.read())
+        reader = threading.Thread(target=read)
+        reader.start()
+        with open_file_sink(self.path) as sink:
+            self.assertIsInstance(sink, FileSink)
+            sink.write("piped")
+        reader.join()
+        self.assertEqual(received, ["piped"])
+        self.assertTrue(stat.S_ISFIFO(os.stat(self.path).st_mode))
+
+    def test_binary(self):
+        with open_file_sink(self.path, binary=True) as sink:
+            self.assertIsInstance(sink, AtomicFileSink)
+            sink.write("zażółć".encode("utf-8"))
+        self.assertEqual(self.read(), "zażółć")
+
+    def test_builder(self):
+        sink = MemorySink()
+        output = SinkOutputBuilder(sink, 4)
+        output.append("ab")
+        self.assertEqual(sink.chunks, [])
+        output.append("cd")
+        self.assertEqual(sink.chunks, ["abcd"])
+        output.append("e")
+        self.assertEqual(output.build(), "")
+        self.assertEqual(sink.chunks, ["abcd", "e"])
+        self.assertEqual(output.written, 5)
+
+    def test_transform_to(self):
+        source_text = "#A(P){<&P&>}\n" + "$A(x) text\n" * 100 + "#B(){unused}"
+        (expected, expected_logs) = MacroGenerator().transform(source_text)
+        for flush_size in [1, 7, 1024 * 1024]:
+            sink = MemorySink()
+            logs = MacroGenerator().transform_to(source_text, sink, flush_size)
+            self.assertEqual(sink.getvalue(), expected)
+            self.assertEqual([(log.err_code, log.line) for log in logs],
+                             [(log.err_code, log.line) for log in expected_logs])
+
+        with open(self.path, 'w') as file:
+            file.write("old")
+        with self.assertRaises(Log):
+            with AtomicFileSink(self.path) as sink:
+                MacroGenerator().transform_to("text " * 100 + "$MISSING()", sink, 1)
+        self.assertEqual(self.read(), "old")
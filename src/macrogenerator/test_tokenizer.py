@@ -0,0 +1,49 @@
+import unittest
+from .tokenizer import *
+
+class TestTokenizer(unittest.TestCase):
+    """ Tests for the Tokenizer class
+    """
+    def kinds(self, text: str, final: bool = True) -> [(str, str)]:
+        return [(token.kind, token.value) for token in Tokenizer(text, final=final)]
+
+    def test_text(self):
+        self.assertEqual(self.kinds("plain (text), & {more}\\$"), [
+            (TOKEN_TEXT, "plain (text), & {more}"), (TOKEN_ESCAPE, "$"), (TOKEN_END, "")])
+
+    def test_definition(self):
+        self.assertEqual(self.kinds("#M(A, B) {&A&\\&}\n x"), [
+            (TOKEN_DEF_START, ""), (TOKEN_TEXT, "M"), (TOKEN_ARG_START, ""),
+            (TOKEN_TEXT, "A"), (TOKEN_SEPARATOR, ""), (TOKEN_TEXT, " B"), (TOKEN_ARG_END, ""),
+            (TOKEN_SPACE, " "), (TOKEN_BODY_START, ""), (TOKEN_ARG_REF, "A"), (TOKEN_ESCAPE, "&"),
+            (TOKEN_BODY_END, ""), (TOKEN_SPACE, "\n "), (TOKEN_TEXT, "x"), (TOKEN_END, "")])
+
+    def test_call(self):
+        self.assertEqual(self.kinds("$M(a&,\\,{})"), [
+            (TOKEN_CALL_START, ""), (TOKEN_TEXT, "M"), (TOKEN_ARG_START, ""),
+            (TOKEN_TEXT, "a&"), (TOKEN_SEPARATOR, ""), (TOKEN_ESCAPE, ","), (TOKEN_TEXT, "{}"),
+            (TOKEN_ARG_END, ""), (TOKEN_END, "")])
+
+    def test_lines(self):
+        tokens = list(Tokenizer("a\nb\n#M\n(P\n){&P\n&}\n$M(\n1)"))
+        self.assertEqual([(token.kind, token.line) for token in tokens], [
+            (TOKEN_TEXT, 1), (TOKEN_DEF_START, 3), (TOKEN_TEXT, 3), (TOKEN_ARG_START, 3),
+            (TOKEN_TEXT, 3), (TOKEN_ARG_END, 4), (TOKEN_BODY_START, 4), (TOKEN_ARG_REF, 4),
+            (TOKEN_BODY_END, 4), (TOKEN_SPACE, 4), (TOKEN_CALL_START, 5), (TOKEN_TEXT, 5),
+            (TOKEN_ARG_START, 5), (TOKEN_TEXT, 5), (TOKEN_ARG_END, 6), (TOKEN_END, 6)])
+
+    def test_not_final(self):
+        self.assertEqual(self.kinds("text\\", False), [(TOKEN_TEXT, "text"), (TOKEN_END, "")])
+        self.assertEqual(self.kinds("#M(){&A", False), [
+            (TOKEN_DEF_START, ""), (TOKEN_TEXT, "M"), (TOKEN_ARG_START, ""), (TOKEN_ARG_END, ""),
+            (TOKEN_BODY_START, ""), (TOKEN_END, "")])
+        self.assertEqual(self.kinds("#M(){}  ", False)[-2:], [(TOKEN_BODY_END, ""), (TOKEN_END, "")])
+
+    def test_bulk_text(self):
+        text = "plain text line\n" * 1000
+        tokens = list(Tokenizer(text + "$M()  \n#N(){}　\n\nx"))
+        self.assertEqual((tokens[0].kind, tokens[0].value, tokens[0].end), (TOKEN_TEXT, text, len(text)))
+        self.assertEqual(tokens[1].line, 1001)
+        space = [token for token in tokens if token.kind == TOKEN_SPACE][0]
+        self.assertEqual((space.value, space.line), ("　\n\n", 1002))
+        self.assertEqual(tokens[-1].line, 1004)
@@ -0,0 +1,271 @@
+"""Module macrogenerator.tokenizer
+
+This module splits the text of the macro language into tokens.
+
+The tokenizer follows the structure of definitions and calls, so that the same special
+symbol yields a token of a different kind depending on where it appears, e.g. the argument
+symbol is an argument reference only inside a macro body.
+
+Lines of the tokens are counted the way the macrogenerator reports them: newlines in macro names,
+argument references and escapes are not counted.
+"""
+
+import re
+
+from symbol.symbolset import DEFAULT_SYMBOLS, SymbolSet
+
+TOKEN_TEXT = "TEXT"                 # run of text, value is the text
+TOKEN_ESCAPE = "ESCAPE"             # escape character, value is the escaped character
+TOKEN_DEF_START = "DEF_START"       # definition symbol
+TOKEN_CALL_START = "CALL_START"     # call symbol
+TOKEN_ARG_START = "ARG_START"       # start of the parameter or argument list
+TOKEN_ARG_END = "ARG_END"           # end of the parameter or argument list
+TOKEN_SEPARATOR = "SEPARATOR"       # parameter or argument separator
+TOKEN_ARG_REF = "ARG_REF"           # argument reference inside a macro body, value is the argument name
+TOKEN_BODY_START = "BODY_START"     # start of a macro body
+TOKEN_BODY_END = "BODY_END"         # end of a macro body
+TOKEN_SPACE = "SPACE"               # whitespace around a macro body, value is the whitespace
+TOKEN_END = "END"                   # end of the tokenized text, always the last token
+
+SPACE_PATTERN = re.compile(r"\s*")
+
+class Token():
+    """ Class describing a single token
+
+    Attributes:
+        kind (str):     kind of the token, one of the TOKEN_ constants
+        value (str):    text, escaped character, argument name or whitespace of the token, empty for symbols
+        line (int):     line at which the token starts
+        start (int):    index of the first character of the token in the source text
+        end (int):      index right after the last character of the token in the source text
+    """
+    __slots__ = ("kind", "value", "line", "start", "end")
+
+    def __init__(self, kind: str, value: str, line: int, start: int, end: int):
+        self.kind = kind
+        self.value = value
+        self.line = line
+        self.start = start
+        self.end = end
+
+    def __repr__(self) -> str:
+        return "Token(%s, %r, %d)" % (self.kind, self.value, self.line)
+
+class Tokenizer():
+    """ Class lazily splitting the text into tokens
+
+    When the text is not final, i.e. more input may follow it, the tokenizer stops before a token
+    whose value could still change: an escape, an argument reference or the whitespace after a body.
+    Runs of text are split at the end of the text instead.
+
+    Attributes:
+        source_text (str):  the text to be tokenized
+        pos (int):          index in source_text of the next character to tokenize
+        line (int):         line of the next character to tokenize
+        final (bool):       whether source_text contains the end of the input
+        symbols (SymbolSet):    the special symbols of the syntax
+    """
+    def __init__(self, source_text: str, pos: int = 0, line: int = 1, final: bool = True,
+                    symbols: SymbolSet = DEFAULT_SYMBOLS):
+        """
+        Args:
+            source_text (str):  the text to be tokenized
+            pos (int):          index in source_text to start at
+            line (int):         line at which the tokenization starts
+            final (bool):       whether source_text contains the end of the input
+            symbols (SymbolSet):    the special symbols of the syntax
+        """
+        self.source_text = source_text
+        self.pos = pos
+        self.line = line
+        self.final = final
+        self.symbols = symbols
+
+    def __iter__(self):
+        return self.tokens()
+
+    def tokens(self):
+        """ Generator yielding the tokens of the text, ending with a TOKEN_END token
+        """
+        source_text = self.source_text
+        length = len(source_text)
+        symbols = self.symbols
+        while self.pos < length:
+            char = source_text[self.pos]
+            if char == symbols.escape:
+                if self.pos + 1 >= length and not self.final:
+                    break
+                yield self.__escape()
+            elif char == symbols.definition:
+                yield self.__symbol(TOKEN_DEF_START)
+                yield from self.__definition()
+            elif char == symbols.call:
+                yield self.__symbol(TOKEN_CALL_START)
+                yield from self.__call()
+            else:
+                yield self.__text(symbols.text_stop, True)
+        yield Token(TOKEN_END, "", self.line, self.pos, self.pos)
+
+    def __definition(self):
+        """ Generator yielding the tokens of a definition following the definition symbol
+        """
+        source_text = self.source_text
+        length = len(source_text)
+        symbols = self.symbols
+
+        # Name
+        yield from self.__name()
+        if self.pos >= length:
+            return
+        yield self.__symbol(TOKEN_ARG_START)
+
+        # Parameters
+        while self.pos < length:
+            char = source_text[self.pos]
+            if char == symbols.arg_separator:
+                yield self.__symbol(TOKEN_SEPARATOR)
+            elif char == symbols.arg_end:
+                yield self.__symbol(TOKEN_ARG_END)
+                break
+            else:
+                yield self.__text(symbols.parameters_stop, True)
+
+        # Body start
+        if self.pos < length and source_text[self.pos].isspace():
+            yield self.__space()
+        if self.pos >= length or source_text[self.pos] != symbols.body_start:
+            return
+        yield self.__symbol(TOKEN_BODY_START)
+
+        # Body
+        while self.pos < length:
+            char = source_text[self.pos]
+            if char == symbols.escape:
+                if self.pos + 1 >= length and not self.final:
+                    self.pos = length
+                    return
+                yield self.__escape()
+            elif char == symbols.argument:
+                token = self.__argument()
+                if token is None:
+                    self.pos = length
+                    return
+                yield token
+            elif char == symbols.body_end:
+                yield self.__symbol(TOKEN_BODY_END)
+                break
+            elif char == symbols.definition:
+                yield self.__symbol(TOKEN_DEF_START)
+            elif char == symbols.call:
+                yield self.__symbol(TOKEN_CALL_START)
+            else:
+                yield self.__text(symbols.body_stop, True)
+        else:
+            return
+
+        # Whitespace after the body, empty if there is none
+        token = self.__space()
+        if self.pos >= length and not self.final:
+            return
+        yield token
+
+    def __call(self):
+        """ Generator yielding the tokens of a call following the call symbol
+        """
+        source_text = self.source_text
+        length = len(source_text)
+        symbols = self.symbols
+
+        # Name
+        yield from self.__name()
+        if self.pos >= length:
+            return
+        yield self.__symbol(TOKEN_ARG_START)
+
+        # Arguments
+        while self.pos < length:
+            char = source_text[self.pos]
+            if char == symbols.escape:
+                if self.pos + 1 >= length and not self.final:
+                    self.pos = length
+                    return
+                yield self.__escape()
+            elif char == symbols.arg_separator:
+                yield self.__symbol(TOKEN_SEPARATOR)
+            elif char == symbols.arg_end:
+                yield self.__symbol(TOKEN_ARG_END)
+                break
+            elif char == symbols.definition:
+                yield self.__symbol(TOKEN_DEF_START)
+            elif char == symbols.call:
+                yield self.__symbol(TOKEN_CALL_START)
+            else:
+                yield self.__text(symbols.arguments_stop, True)
+
+    def __name(self):
+        """ Generator yielding the name of a macro as a text token, if it is not empty
+        """
+        if self.pos < len(self.source_text) and self.source_text[self.pos] != self.symbols.arg_start:
+            yield self.__text(self.symbols.name_stop, False)
+
+    def __symbol(self, kind: str) -> Token:
+        """ Gets a token of a single special symbol
+
+        Args:
+            kind (str):         kind of the token
+        """
+        token = Token(kind, "", self.line, self.pos, self.pos + 1)
+        self.pos = self.pos + 1
+        return token
+
+    def __escape(self) -> Token:
+        """ Gets a token of an escape character and the escaped character.
+        The escaped character is empty if the input ends right after the escape character.
+        """
+        start = self.pos
+        end = min(start + 2, len(self.source_text))
+        self.pos = end
+        return Token(TOKEN_ESCAPE, self.source_text[start + 1:end], self.line, start, end)
+
+    def __argument(self) -> Token:
+        """ Gets a token of an argument reference.
+        The reference extends to the end of the input if it is not closed,
+        or None is returned if it is not closed and the text is not final.
+        """
+        start = self.pos
+        end = self.source_text.find(self.symbols.argument, start + 1)
+        if end == -1:
+            if not self.final:
+                return None
+            self.pos = len(self.source_text)
+            end = self.pos
+        else:
+            self.pos = end + 1
+        return Token(TOKEN_ARG_REF, self.source_text[start + 1:end], self.line, start, self.pos)
+
+    def __space(self) -> Token:
+        """ Gets a token of the whitespace at the current position
+        """
+        start = self.pos
+        line = self.line
+        pos = SPACE_PATTERN.match(self.source_text, start).end()
+        self.line = line + self.source_text.count("\n", start, pos)
+        self.pos = pos
+        return Token(TOKEN_SPACE, self.source_text[start:pos], line, start, pos)
+
+    def __text(self, stop, count_lines: bool) -> Token:
+        """ Gets a token of the text up to the next stop character
+
+        Args:
+            stop (Pattern):     pattern of the characters ending the text, one of the patterns of the SymbolSet
+            count_lines (bool): whether newlines in the text are counted
+        """
+        source_text = self.source_text
+        start = self.pos
+        line = self.line
+        found = stop.search(source_text, start)
+        pos = len(source_text) if found is None else found.start()
+        if count_lines:
+            self.line = line + source_text.count("\n", start, pos)
+        self.pos = pos
+        return Token(TOKEN_TEXT, source_text[start:pos], line, start, pos)
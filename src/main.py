@@ -1,17 +1,127 @@
 #!/usr/bin/python3
 
 from optparse import OptionParser
+import os
 import sys
+import time
 
-from macrogenerator.macrogenerator import MacroGenerator
+from macrogenerator.macrogenerator import MacroGenerator, load_prelude
+from macrogenerator.batch import BatchResult, collect_inputs, plan_outputs, run_batch
+from macrogenerator.daemon import Daemon, send_requests
+from macrogenerator.librarycache import LibraryCache
+from macrogenerator.outputsink import DEFAULT_BUFFER_SIZE, FileSink, OutputSink, StdoutSink, open_file_sink
 from error.errorlibrary import get_error_lib
 from error.log import Log
+from error.logrecord import LogRecord
+from symbol.symbolset import SYMBOL_PROFILES, SymbolSetException, get_symbol_set
 
 error_lib = get_error_lib()
 
+# the file name standing for the standard input or output
+STDIO = "-"
+
+def print_error(strerror: str, options, log_out) -> None:
+    """ Prints the error e98 of a file which cannot be accessed
+    """
+    if not options.silent:
+        er = error_lib.get_error("e98")
+        if options.verbose:
+            er_str = er.what_long(None, [strerror])
+        else:
+            er_str = er.what_short(None)
+        print(er_str, file=log_out)
+
+def print_warnings(logs: [LogRecord], dropped: int, options, log_out, prefix: str = "") -> None:
+    """ Prints the summary and the warnings of an expansion, at most options.max_warnings of them
+
+    Args:
+        logs ([LogRecord]): the warnings kept by the expansion
+        dropped (int):  amount of warnings counted, but not kept by the expansion
+        prefix (str):   text at the start of every line, e.g. the name of the input file
+    """
+    count = len(logs) + dropped
+    if count == 1:
+        print("%sExecution completed with %d warning:" % (prefix, count), file=log_out)
+    elif count > 1:
+        print("%sExecution completed with %d warnings:" % (prefix, count), file=log_out)
+    else:
+        print("%sExecution completed with no warnings." % prefix, file=log_out)
+    print_warning_lines(logs, dropped, options, log_out, prefix)
+
+def print_warning_lines(logs: [LogRecord], dropped: int, options, log_out, prefix: str = "") -> None:
+    """ Prints warnings without a summary, at most options.max_warnings of them
+
+    Args:
+        logs ([LogRecord]): the warnings kept
+        dropped (int):  amount of warnings counted, but not kept
+        prefix (str):   text at the start of every line, e.g. the name of the input file
+    """
+    if options.silent or not options.warnings:
+        return
+    if options.max_warnings != None and len(logs) > options.max_warnings:
+        dropped = dropped + len(logs) - options.max_warnings
+        logs = logs[:options.max_warnings]
+    if options.verbose:
+        describe = error_lib.what_long
+    else:
+        describe = error_lib.what_short
+    # the messages are formatted only now, and written at once
+    log_out.write("".join(prefix + describe(log) + "\n" for log in logs))
+    if dropped > 0:
+        print("%s%d more warnings not shown." % (prefix, dropped), file=log_out)
+
+def open_sink(output_file: str, options, binary: bool = False) -> OutputSink:
+    """ Opens the sink the output file is written through, the standard output for STDIO
+
+    Can throw OSError when the file cannot be created.
+
+    Args:
+        binary (bool):  whether the file receives bytes, for mapped input; the standard output always receives text
+    """
+    if output_file == STDIO:
+        return StdoutSink()
+    if options.direct:
+        return FileSink(output_file, options.buffer_size, binary)
+    return open_file_sink(output_file, options.buffer_size, binary)
+
+def print_result(result: BatchResult, options, log_out) -> None:
+    """ Prints the outcome of expanding a single file in batch, watch or daemon mode
+    """
+    if result.error != None:
+        if not options.silent:
+            print("%s: Execution unsuccesful." % result.input_file, file=log_out)
+            if options.verbose:
+                er_str = error_lib.what_long(result.error)
+            else:
+                er_str = error_lib.what_short(result.error)
+            print("%s: %s" % (result.input_file, er_str), file=log_out)
+        log_out.flush()
+        return
+    print_warnings(result.logs, result.warnings_dropped, options, log_out, "%s: " % result.input_file)
+    log_out.flush()
+
+def expand_on_demand(jobs: [(str, str)], daemon: Daemon, options, log_out) -> None:
+    """ Expands the files with a running daemon, or keeps expanding them whenever they change
+    """
+    if options.watch:
+        try:
+            daemon.watch(jobs, lambda result: print_result(result, options, log_out), options.interval)
+        except KeyboardInterrupt:
+            pass
+        return
+    try:
+        results = send_requests(options.connect, jobs)
+    except OSError as e:
+        print_error(e.strerror, options, log_out)
+        return
+    for result in results:
+        print_result(result, options, log_out)
+
 if __name__ == "__main__":
     # CLI Parsing
-    usage = "usage: %prog [options] input_file [output_file]"
+    usage = "usage: %prog [options] input_file [output_file]\n" \
+            "       %prog [options] - [output_file]    (reads the standard input, writes the standard output)\n" \
+            "       %prog [options] -b input_dir|glob|@manifest..."
     opt_parser = OptionParser(usage=usage)
     opt_parser.add_option("-s", "--silent", action="store_true", dest="silent",
                             default=False, help="turns off the error/warning output")
@@ -21,27 +131,163 @@ if __name__ == "__main__":
                             default=True, help="mutes warning output")
     opt_parser.add_option("-o", "--output", action="store", type="string", dest="filename",
                             help="redirects the error/warning output to a file")
+    opt_parser.add_option("-m", "--mmap", action="store_true", dest="mmap",
+                            default=False, help="maps the input file into memory instead of reading it, "
+                            "for very large UTF-8 inputs")
+    opt_parser.add_option("-p", "--prelude", action="store", type="string", dest="prelude",
+                            help="loads the macro definitions of a file once and makes them available to every input")
+    opt_parser.add_option("-u", "--prelude-unused", action="store_true", dest="prelude_unused",
+                            default=False, help="reports unused macros of the prelude as well")
+    opt_parser.add_option("--cache-dir", action="store", type="string", dest="cache_dir",
+                            help="directory of the cache of compiled preludes, ~/.cache/macrogenerator by default")
+    opt_parser.add_option("--no-cache", action="store_false", dest="cache",
+                            default=True, help="always parses the prelude instead of using the cache")
+    opt_parser.add_option("-b", "--batch", action="store_true", dest="batch",
+                            default=False, help="expands all the files given by directories, glob patterns "
+                            "or @manifest files listing one file per line")
+    opt_parser.add_option("-j", "--jobs", action="store", type="int", dest="jobs",
+                            help="amount of worker processes in batch mode, all cores by default")
+    opt_parser.add_option("-d", "--output-dir", action="store", type="string", dest="output_dir",
+                            default="mg_out", help="directory for the expanded files in batch mode")
+    opt_parser.add_option("-w", "--watch", action="store_true", dest="watch",
+                            default=False, help="keeps running and expands the inputs again whenever they "
+                            "or the prelude change")
+    opt_parser.add_option("--interval", action="store", type="float", dest="interval",
+                            default=0.5, help="seconds between checks for changes in watch mode")
+    opt_parser.add_option("--serve", action="store", type="string", dest="serve", metavar="SOCKET",
+                            help="keeps running and expands files requested over a Unix socket")
+    opt_parser.add_option("--connect", action="store", type="string", dest="connect", metavar="SOCKET",
+                            help="expands the inputs with a daemon started with --serve")
+    opt_parser.add_option("--stats", action="store_true", dest="stats",
+                            default=False, help="prints the time spent in each phase, counters "
+                            "and the costliest macros of the expansion")
+    opt_parser.add_option("--syntax", action="store", type="string", dest="syntax", metavar="PROFILE",
+                            default="default", help="special symbols of the input and the prelude: one of %s, "
+                            "or all nine symbols in the order #$(){}&,\\ (default: default)"
+                            % ", ".join(SYMBOL_PROFILES))
+    opt_parser.add_option("--max-warnings", action="store", type="int", dest="max_warnings", metavar="N",
+                            help="keeps only the first N warnings of an input, the others are only counted")
+    opt_parser.add_option("--expansion-cache", action="store", type="int", dest="cache_size", metavar="N",
+                            help="caches the expansions of the last N distinct calls, for inputs repeating "
+                            "the same calls")
+    opt_parser.add_option("--buffer-size", action="store", type="int", dest="buffer_size", metavar="BYTES",
+                            default=DEFAULT_BUFFER_SIZE, help="size of the output write buffer (default: 1 MiB)")
+    opt_parser.add_option("--direct", action="store_true", dest="direct",
+                            default=False, help="writes the output file in place instead of through a temporary "
+                            "file renamed once complete, a failed expansion leaves a partial file")
     (options, args) = opt_parser.parse_args()
 
     # CLI Errors/Warnings
     if options.silent and options.verbose:
         opt_parser.error("Options -s and -v are mutually exclusive.")
-    if len(args) < 1:
+    if options.serve != None and (options.connect != None or options.watch):
+        opt_parser.error("Option --serve cannot be combined with --connect or -w.")
+    if options.connect != None and options.watch:
+        opt_parser.error("Options --connect and -w are mutually exclusive.")
+    if len(args) < 1 and options.serve == None:
         opt_parser.error("No input file provided!")
-    if len(args) > 2:
-        print("More than 2 arguments provided, excess arguments will be ignored.")
-    
+    if options.stats and (options.batch or options.watch or options.serve != None or options.connect != None):
+        opt_parser.error("Option --stats is only available when expanding a single file.")
+    if options.cache_size != None and (options.batch or options.watch or options.serve != None or options.connect != None):
+        opt_parser.error("Option --expansion-cache is only available when expanding a single file.")
+    if options.cache_size != None and options.cache_size < 1:
+        opt_parser.error("The size of the expansion cache has to be positive.")
+    if options.max_warnings != None and options.max_warnings < 0:
+        opt_parser.error("The amount of warnings kept cannot be negative.")
+    if STDIO in args and (options.batch or options.watch or options.connect != None):
+        opt_parser.error("The standard input and output (-) are only available when expanding a single file.")
+    if options.buffer_size < 1:
+        opt_parser.error("The size of the output buffer has to be positive.")
+    if options.jobs != None and options.jobs < 1:
+        opt_parser.error("The amount of worker processes has to be positive.")
+    try:
+        symbols = get_symbol_set(options.syntax)
+    except SymbolSetException as e:
+        opt_parser.error(str(e))
+
     # Assigning I/O variables
-    if options.filename == None:
-        log_out = sys.stdout
-    else:
+    if options.filename != None:
         log_out = open(options.filename, 'w')
+    elif not options.batch and (args[:1] == [STDIO] or args[1:2] == [STDIO]):
+        # the standard output may carry the resulting text, diagnostics must not mix into it
+        log_out = sys.stderr
+    else:
+        log_out = sys.stdout
+    if len(args) > 2 and not options.batch:
+        print("More than 2 arguments provided, excess arguments will be ignored.", file=log_out)
+
+    # The daemon keeps the prelude loaded, reloading it when it changes
+    daemon = None
+    if options.serve != None or options.watch:
+        daemon = Daemon(options.prelude, options.prelude_unused, LibraryCache(options.cache_dir) if options.cache else None,
+                        symbols)
+
+    # Load the prelude
+    prelude = None
+    prelude_logs = []
+    prelude_started = time.perf_counter()
+    if options.prelude != None and options.connect == None:
+        try:
+            if daemon != None:
+                prelude_logs = daemon.load_prelude()
+                prelude = daemon.prelude
+            else:
+                with open(options.prelude, 'r') as file:
+                    prelude_str = file.read()
+                if options.cache:
+                    (prelude, prelude_logs) = LibraryCache(options.cache_dir).load_prelude(prelude_str, symbols)
+                else:
+                    (prelude, prelude_logs) = load_prelude(prelude_str, symbols)
+        except FileNotFoundError as e:
+            print_error(e.strerror, options, log_out)
+            exit(1)
+        except Log as e:
+            if not options.silent:
+                print("%s: Execution unsuccesful." % options.prelude, file=log_out)
+                if options.verbose:
+                    er_str = error_lib.what_long(e)
+                else:
+                    er_str = error_lib.what_short(e)
+                print("%s: %s" % (options.prelude, er_str), file=log_out)
+            exit(1)
+        print_warning_lines(prelude_logs, 0, options, log_out, "%s: " % options.prelude)
+
+    prelude_time = time.perf_counter() - prelude_started
+
+    # Daemon mode
+    if options.serve != None:
+        try:
+            daemon.serve(options.serve)
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            print_error(e.strerror, options, log_out)
+        exit()
+
+    # Batch mode
+    if options.batch:
+        try:
+            jobs = plan_outputs(collect_inputs(args), options.output_dir)
+        except OSError as e:
+            print_error(e.strerror, options, log_out)
+            exit()
+        if options.watch or options.connect != None:
+            expand_on_demand(jobs, daemon, options, log_out)
+            exit()
+        for result in run_batch(jobs, options.jobs, prelude, options.prelude_unused, symbols,
+                                options.max_warnings):
+            print_result(result, options, log_out)
+        exit()
+
     input_file = args[0]
     if len(args) == 1:
-        output_file = "mg_out"
+        output_file = STDIO if input_file == STDIO else "mg_out"
     else:
         output_file = args[1]
-    if input_file == output_file:
+    if input_file == STDIO:
+        # the standard input is streamed, it cannot be mapped
+        options.mmap = False
+    elif input_file == output_file:
         if not options.silent and options.warnings:
             warn = error_lib.get_error("w80")
             if options.verbose:
@@ -49,26 +295,45 @@ if __name__ == "__main__":
             else:
                 warn_str = warn.what_short(None)
             print(warn_str, file=log_out)
+        # the output file would be truncated while it is still mapped
+        options.mmap = False
+    if options.watch or options.connect != None:
+        expand_on_demand([(input_file, output_file)], daemon, options, log_out)
+        exit()
 
     # Get the input
+    read_started = time.perf_counter()
     try:
-        with open(input_file, 'r') as file:
-            input_str = file.read()
+        if options.mmap:
+            input_bin = open(input_file, 'rb')
+        elif input_file != STDIO:
+            with open(input_file, 'r') as file:
+                input_str = file.read()
     except FileNotFoundError as e:
-        if not options.silent:
-            er = error_lib.get_error("e98")
-            if options.verbose:
-                er_str = er.what_long(None, [e.strerror])
-            else:
-                er_str = er.what_short(None)
-            print(er_str, file=log_out)
-        exit()
+        print_error(e.strerror, options, log_out)
+        exit(1)
+
+    read_time = time.perf_counter() - read_started
 
     # Call the macro generator
-    macro_generator = MacroGenerator()
+    macro_generator = MacroGenerator(prelude, options.prelude_unused, options.stats, symbols, options.max_warnings,
+                                        options.cache_size)
 
     try:
-        (output_str, logs) = macro_generator.transform(input_str)
+        if options.mmap and output_file == STDIO:
+            with input_bin:
+                logs = macro_generator.transform_mapped(input_bin, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+        elif options.mmap:
+            # the mapped input is written by a binary file object, the one the sink writes to
+            with input_bin, open_sink(output_file, options, True) as sink:
+                logs = macro_generator.transform_mapped(input_bin, sink.file)
+        else:
+            with open_sink(output_file, options) as sink:
+                if input_file == STDIO:
+                    logs = macro_generator.transform_stream(sys.stdin, sink)
+                else:
+                    logs = macro_generator.transform_to(input_str, sink)
     except Log as e:
         if not options.silent:
             print("Execution unsuccesful.", file=log_out)
@@ -77,32 +342,23 @@ if __name__ == "__main__":
             else:
                 er_str = error_lib.what_short(e)
             print(er_str, file=log_out)
-        exit()
+        exit(1)
+    except BrokenPipeError:
+        # the reader of the standard output stopped early, like head does, nothing more can be written to it
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        exit(1)
+    except OSError as e:
+        print_error(e.strerror, options, log_out)
+        exit(1)
     # Print warnings
-    if len(logs) == 1:
-        print("Execution completed with %d warning:" % len(logs), file=log_out)
-    elif len(logs) > 1:
-        print("Execution completed with %d warnings:" % len(logs), file=log_out)
-    else:
-        print("Execution completed with no warnings.", file=log_out)
-    for log in logs:
-        if not options.silent and options.warnings:
-            if options.verbose:
-                warn_str = error_lib.what_long(log)
-            else:
-                warn_str = error_lib.what_short(log)
-            print(warn_str, file=log_out)
+    print_warnings(logs, macro_generator.context.warnings_dropped, options, log_out)
 
-    # Output
-    try:
-        with open(output_file, 'w') as file:
-            file.write(output_str)
-    except FileNotFoundError as e:
-        if not options.silent:
-            er = error_lib.get_error("e98")
-            if options.verbose:
-                er_str = er.what_long(None, [e.strerror])
-            else:
-                er_str = er.what_short(None)
-            print(er_str, file=log_out)
-        exit()
+    # Statistics
+    if options.stats:
+        stats = macro_generator.get_stats()
+        if options.prelude != None:
+            stats.add_time("prelude", prelude_time)
+        if input_file != STDIO:
+            stats.add_time("read", read_time)
+        for line in stats.format():
+            print(line, file=log_out)
@@ -2,7 +2,8 @@
 
 This module stores the special symbols used by the macrogenerator
 
-They should be treated as constants and NOT be changed at runtime
+They should be treated as constants and NOT be changed at runtime,
+other syntaxes are described by a SymbolSet, see symbol.symbolset
 """
 
 SYMBOL_DEFINITION = '#'
@@ -14,8 +15,3 @@ SYMBOL_BODY_END = '}'
 SYMBOL_ARGUMENT = '&'
 SYMBOL_ARG_SEPARATOR = ','
 ESCAPE_CHARACTER = '\\'
-
-def IS_SPECIAL(char: str):
-    return char == SYMBOL_DEFINITION or char == SYMBOL_CALL or char == SYMBOL_BODY_START or char == SYMBOL_BODY_END \
-        or char == SYMBOL_ARGUMENT or char == SYMBOL_ARG_START or char == SYMBOL_ARG_END or char == SYMBOL_ARG_SEPARATOR \
-            or char == ESCAPE_CHARACTER
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""Module symbol.symbolset
+
+This module describes configurable sets of the special symbols, i.e. the syntax of the macro language.
+
+A SymbolSet is compiled once, when it is created, into the lookup structures the macrogenerator
+scans with, so a custom syntax costs no more per character than the default one.
+"""
+
+import re
+
+from .symbol import *
+
+# order of the symbols in the string form of a SymbolSet
+SYMBOL_ORDER = ["definition", "call", "arg_start", "arg_end", "body_start", "body_end",
+                    "argument", "arg_separator", "escape"]
+MAPPED_ENCODING = "utf-8"
+
+class SymbolSetException(Exception):
+    """Exception for invalid sets of special symbols
+    """
+    def __init__(self, message: str):
+        """
+        Args:
+            message (str):  the error message
+        """
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+def STOP_PATTERN(stop: str):
+    """ Compiles a pattern finding the next of the stop characters
+    """
+    return re.compile("[" + re.escape(stop) + "]")
+
+def MAPPED_STOP_PATTERN(stop: str):
+    """ Compiles a pattern finding the next of the stop characters in UTF-8 encoded bytes.
+    Every character is matched as a whole sequence, so a match never starts inside another character.
+    """
+    return re.compile(b"|".join(re.escape(char.encode(MAPPED_ENCODING)) for char in stop))
+
+class SymbolSet():
+    """ Class describing the special symbols of a syntax, compiled into lookup structures
+
+    Attributes:
+        definition (str):       symbol starting a macro definition
+        call (str):             symbol starting a macro call
+        arg_start (str):        symbol starting a parameter or argument list
+        arg_end (str):          symbol ending a parameter or argument list
+        body_start (str):       symbol starting a macro body
+        body_end (str):         symbol ending a macro body
+        argument (str):         symbol around argument references in a macro body
+        arg_separator (str):    symbol separating parameters and arguments
+        escape (str):           escape character
+        special (frozenset):    all the special symbols
+        text_stop (Pattern):    pattern finding the end of a run of plain text
+        parameters_stop (Pattern):  pattern finding the end of a parameter name
+        body_stop (Pattern):    pattern finding the end of a run of text in a macro body
+        arguments_stop (Pattern):   pattern finding the end of a run of text in the arguments of a call
+        name_stop (Pattern):    pattern finding the end of a macro name
+        invalid_name (Pattern): pattern finding characters not allowed in names of macros and parameters
+        mapped_text_stop (Pattern): text_stop for UTF-8 encoded bytes
+    """
+    def __init__(self, definition: str = SYMBOL_DEFINITION, call: str = SYMBOL_CALL,
+                    arg_start: str = SYMBOL_ARG_START, arg_end: str = SYMBOL_ARG_END,
+                    body_start: str = SYMBOL_BODY_START, body_end: str = SYMBOL_BODY_END,
+                    argument: str = SYMBOL_ARGUMENT, arg_separator: str = SYMBOL_ARG_SEPARATOR,
+                    escape: str = ESCAPE_CHARACTER):
+        """
+        Can throw SymbolSetException if a symbol is not a single non-whitespace character,
+        or if two symbols are the same.
+        """
+        self.definition = definition
+        self.call = call
+        self.arg_start = arg_start
+        self.arg_end = arg_end
+        self.body_start = body_start
+        self.body_end = body_end
+        self.argument = argument
+        self.arg_separator = arg_separator
+        self.escape = escape
+
+        for (name, symbol) in zip(SYMBOL_ORDER, self.as_list()):
+            if not isinstance(symbol, str) or len(symbol) != 1 or symbol.isspace():
+                raise SymbolSetException("The %s symbol %r is not a single non-whitespace character" % (name, symbol))
+        symbols = self.as_string()
+        if len(set(symbols)) != len(symbols):
+            raise SymbolSetException("The symbols %r are not all different" % symbols)
+
+        self.special = frozenset(symbols)
+        text_stop = escape + definition + call
+        self.text_stop = STOP_PATTERN(text_stop)
+        self.parameters_stop = STOP_PATTERN(arg_separator + arg_end)
+        self.body_stop = STOP_PATTERN(escape + argument + body_end + definition + call)
+        self.arguments_stop = STOP_PATTERN(escape + arg_separator + arg_end + definition + call)
+        self.name_stop = STOP_PATTERN(arg_start)
+        # names of macros and arguments consist of characters which are neither special nor whitespace
+        self.invalid_name = re.compile("[" + re.escape("".join(sorted(self.special))) + r"\s]")
+        self.mapped_text_stop = MAPPED_STOP_PATTERN(text_stop)
+
+    def is_special(self, char: str) -> bool:
+        return char in self.special
+
+    def as_list(self) -> [str]:
+        """ Gets the symbols in the order of SYMBOL_ORDER
+        """
+        return [getattr(self, name) for name in SYMBOL_ORDER]
+
+    def as_string(self) -> str:
+        """ Gets the symbols as a single string in the order of SYMBOL_ORDER, as accepted by get_symbol_set
+        """
+        return "".join(self.as_list())
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SymbolSet) and self.as_string() == other.as_string()
+
+    def __hash__(self) -> int:
+        return hash(self.as_string())
+
+    def __repr__(self) -> str:
+        return "SymbolSet(%r)" % self.as_string()
+
+DEFAULT_SYMBOLS = SymbolSet()
+
+# named syntaxes, selected e.g. with the --syntax option
+SYMBOL_PROFILES = {
+    "default": DEFAULT_SYMBOLS,
+    # shell scripts use '#' for comments, '$' for variables and '\' for quoting
+    "shell": SymbolSet(definition='@', call='%', escape='^'),
+    # C sources use '#' for the preprocessor and '\' in string literals, '@' and '`' are free
+    "c": SymbolSet(definition='@', call='`', escape='~'),
+}
+
+def get_symbol_set(syntax: str) -> SymbolSet:
+    """ Gets the symbols of a syntax
+
+    Can throw SymbolSetException if the syntax is neither a profile nor a valid set of symbols.
+
+    Args:
+        syntax (str):   name of one of SYMBOL_PROFILES, or all nine symbols in the order of SYMBOL_ORDER,
+                        e.g. "#$(){}&,\\" for the default syntax
+
+    Returns:
+        SymbolSet:      the symbols of the syntax
+    """
+    if syntax in SYMBOL_PROFILES:
+        return SYMBOL_PROFILES[syntax]
+    if len(syntax) != len(SYMBOL_ORDER):
+        raise SymbolSetException("Unknown syntax %r, use one of %s or a string of %d symbols"
+                                    % (syntax, ", ".join(SYMBOL_PROFILES), len(SYMBOL_ORDER)))
+    return SymbolSet(*syntax)
@@ -0,0 +1,34 @@
+import pickle
+import unittest
+from .symbolset import *
+
+class TestSymbolSet(unittest.TestCase):
+    """ Tests for the SymbolSet class
+    """
+    def test_default(self):
+        self.assertEqual(DEFAULT_SYMBOLS.as_string(), "#$(){}&,\\")
+        self.assertEqual(get_symbol_set("default"), DEFAULT_SYMBOLS)
+        self.assertEqual(get_symbol_set("#$(){}&,\\"), DEFAULT_SYMBOLS)
+        self.assertTrue(DEFAULT_SYMBOLS.is_special("&"))
+        self.assertFalse(DEFAULT_SYMBOLS.is_special("@"))
+
+    def test_custom(self):
+        symbols = get_symbol_set("@%[]<>!;~")
+        self.assertEqual((symbols.definition, symbols.arg_end, symbols.escape), ("@", "]", "~"))
+        self.assertEqual(symbols.text_stop.search("a#b$c~@").start(), 5)
+        self.assertEqual(symbols.invalid_name.search("NAME#1 ;").start(), 6)
+        self.assertEqual(symbols.mapped_text_stop.search("ż@".encode("utf-8")).start(), 2)
+        self.assertEqual(pickle.loads(pickle.dumps(symbols)), symbols)
+
+    def test_profiles(self):
+        for (name, symbols) in SYMBOL_PROFILES.items():
+            self.assertIs(get_symbol_set(name), symbols)
+        self.assertNotIn("#", SYMBOL_PROFILES["shell"].special)
+        self.assertNotIn("$", SYMBOL_PROFILES["c"].special)
+
+    def test_invalid(self):
+        for syntax in ["unknown", "##(){}&,\\", "# (){}&,\\", "#$(){}&,\\\\"]:
+            with self.assertRaises(SymbolSetException):
+                get_symbol_set(syntax)
+        with self.assertRaises(SymbolSetException):
+            SymbolSet(call="$$")
@@ -1,8 +1,20 @@
 #!/usr/bin/python3
 
 import unittest
+from benchmark.test_benchmark import TestBenchmark
+from error.test_errorlibrary import TestErrorLibrary
+from macrogenerator.test_asyncgenerator import TestAsyncGenerator
+from macrogenerator.test_batch import TestBatch
+from macrogenerator.test_daemon import TestDaemon
+from macrogenerator.test_expansioncache import TestExpansionCache
+from macrogenerator.test_incremental import TestIncremental
+from macrogenerator.test_librarycache import TestLibraryCache
+from macrogenerator.test_macro import TestMacro
 from macrogenerator.test_macrolibrary import TestMacroLibrary
 from macrogenerator.test_macrogenerator import TestMacroGenerator
+from macrogenerator.test_outputsink import TestOutputSink
+from macrogenerator.test_tokenizer import TestTokenizer
+from symbol.test_symbolset import TestSymbolSet
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file